@@ -43,6 +43,9 @@ def create_sim_cmds_extended(simulation_parameters, workdir_path, model_name_ful
     simulation_cmd_params = {"startTime": simulation_parameters.start_time,
                              "stopTime": simulation_parameters.stop_time,
                              "outputInterval": simulation_parameters.output_interval,
+                             "method": f"\"{simulation_parameters.algorithm}\"",
+                             "tolerance": simulation_parameters.tolerance,
+                             "fixedstepsize": simulation_parameters.fixed_stepsize,
                              "resultFile": f"\"{resultfile_path_full}\""}
     if use_init:
         simulation_cmd_params.update({"initialNames":  "{\"" + "\",\"".join(init_variables.keys()) + "\"}",
@@ -1,3 +1,18 @@
 from . import Parameters
 from . import DymolaCommands
-from . import simulation_utils
\ No newline at end of file
+from . import simulation_utils
+from . import dependency_tracking
+from . import sweep_store
+from . import surrogate
+from . import job_scheduler
+from . import result_files
+from . import experiment_pipeline
+from . import result_catalog
+from . import solver_tuning
+from . import calibration
+from . import solver_statistics
+from . import input_tables
+from . import simulation_server
+from . import monte_carlo
+from . import bulk_loader
+from . import regression
\ No newline at end of file
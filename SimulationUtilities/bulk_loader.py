@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from . import simulation_utils as simutils
+from .result_files import DymolaResultFile
+
+
+def read_result_file(result_path: str, trajectory_names: list):
+    """
+    Read trajectories from a result file without Dymola - .mat (Dymola result), .npy (memory-mapped FMU result) or .csv
+    @param result_path: path to result file
+    @param trajectory_names: names of trajectories - non-existing trajectories are skipped
+    @return: dataframe
+    """
+    extension = os.path.splitext(result_path)[1].lower()
+    if extension == ".mat":
+        return DymolaResultFile(result_path).to_dataframe(trajectory_names)
+    if extension == ".npy":
+        results = simutils.read_memmap_result(result_path)
+        names = [name for name in trajectory_names if name in results.columns]
+        # Copy - the file is not kept open
+        return pd.DataFrame(results[names].to_numpy(copy=True), index=results.index.to_numpy(copy=True), columns=names)
+    if extension == ".csv":
+        return simutils.read_result_csv(result_path, usecols=lambda name: name in ["Zeitraum"] + list(trajectory_names))
+    raise Exception(f"Unsupported result file {result_path}.")
+
+
+def load_results(result_files, trajectory_names: list, level_name="sweep_value", max_workers=None, use_processes=False,
+                 progress=True):
+    """
+    Read trajectories from many result files concurrently and concatenate them into one dataframe
+    @param result_files: dict {sweep value: path} or list of paths (key: path)
+    @param trajectory_names: names of trajectories
+    @param level_name: name of the index level of the sweep value
+    @param max_workers: number of workers - default: executor default
+    @param use_processes: read in a process pool instead of a thread pool
+    @param progress: True: print progress, callable: called with (number of loaded files, number of files), False: silent
+    @return: dataframe with index (sweep value, time) - files that cannot be read are skipped
+    """
+    if not isinstance(result_files, dict):
+        result_files = {path: path for path in result_files}
+    keys = list(result_files.keys())
+    results = {}
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers) as executor:
+        futures = {executor.submit(read_result_file, result_files[key], trajectory_names): key for key in keys}
+        for num_loaded, future in enumerate(as_completed(futures), start=1):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as ex:
+                print(f"Reading {result_files[key]} failed: {ex}")
+            _report_progress(progress, num_loaded, len(keys))
+    loaded_keys = [key for key in keys if key in results]
+    if not loaded_keys:
+        return pd.DataFrame(columns=trajectory_names)
+    return pd.concat([results[key] for key in loaded_keys], keys=loaded_keys, names=[level_name, "Time"])
+
+
+def _report_progress(progress, num_loaded, num_files):
+    if callable(progress):
+        progress(num_loaded, num_files)
+    elif progress and (num_loaded == num_files or num_loaded % max(num_files // 10, 1) == 0):
+        print(f"Loaded {num_loaded}/{num_files} result files")
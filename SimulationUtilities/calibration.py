@@ -0,0 +1,279 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import simulation_utils as simutils
+
+
+class Calibrator:
+    """
+    Parallel batched calibration driver.
+    Fits model parameters to a reference dataframe (e.g. measured data). Candidates are evaluated in batches:
+    - simulators with run_ensemble (FMPYEnsembleSimulator): one ensemble run per batch
+    - list of simulators: one simulator per worker thread, e.g. several Dymola instances
+    - single simulator: sequential run_simulation
+    Cost: sum over trajectories of weight * mean squared error on the time grid of the reference - computed vectorized.
+    Identical candidates are evaluated once (memo table).
+    Early stopping (ensemble simulators only): the squared errors seen so far are a lower bound of the final cost,
+    so a simulation is stopped as soon as this bound exceeds the cost it has to beat.
+    Parameters:
+        - simulators: simulator or list of simulators
+        - reference: reference dataframe - columns are compared trajectories
+        - param_names: names of calibrated parameters
+        - bounds: list of (lower, upper) bounds per parameter
+        - weights: dict {trajectory name: weight} - default: 1 / variance of reference
+        - early_stopping: stop simulations that cannot improve
+        - check_interval: number of recorded steps between early stopping checks
+        - memo_decimals: decimals of rounded parameters in memo table
+    Additional Methods:
+    - evaluate
+    - evaluate_batch
+    - gradient
+    - minimize_differential_evolution
+    - minimize_gradient
+    """
+    early_stopping = True
+    check_interval = 50
+    memo_decimals = 12
+
+    def __init__(self, simulators, reference: pd.DataFrame, param_names: list, bounds: list, weights=None,
+                 early_stopping=True, check_interval=50, memo_decimals=12, **kwargs):
+        self.simulators = simulators if isinstance(simulators, (list, tuple)) else [simulators]
+        self.reference = reference
+        self.trajectory_names = list(reference.columns)
+        self.param_names = list(param_names)
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.early_stopping = early_stopping
+        self.check_interval = check_interval
+        self.memo_decimals = memo_decimals
+        self.simulation_kwargs = kwargs
+        self.reference_time_ = simutils.time_index_to_seconds(reference.index)
+        self.reference_values_ = reference.to_numpy(dtype=np.float64)
+        if weights is None:
+            variance = np.var(self.reference_values_, axis=0)
+            self.weights_ = 1.0 / np.where(variance > 0, variance, 1.0)
+        else:
+            self.weights_ = np.array([weights.get(name, 1.0) for name in self.trajectory_names], dtype=np.float64)
+        self.memo_ = {}
+        self.history_ = []
+        self.num_simulations_ = 0
+        self.num_stopped_ = 0
+        self.best_cost_ = np.inf
+        self.best_params_ = None
+
+    def evaluate(self, params: dict):
+        """
+        Evaluate cost of a parameter set
+        @param params: dict {param name: value}
+        @return: cost
+        """
+        return self.evaluate_batch(np.array([[params[name] for name in self.param_names]]))[0]
+
+    def evaluate_batch(self, candidates, thresholds=None):
+        """
+        Evaluate costs of a batch of candidates in parallel
+        @param candidates: array of shape (n, d) - parameter values in order of param_names
+        @param thresholds: costs the candidates have to beat - used for early stopping. Default: best cost
+        @return: array of costs - for stopped simulations a lower bound above the threshold
+        """
+        candidates = np.atleast_2d(np.asarray(candidates, dtype=np.float64))
+        thresholds = np.full(len(candidates), self.best_cost_) if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+        costs = np.empty(len(candidates))
+        # Look up memo table and remove duplicates within the batch
+        pending = {}
+        for index, (candidate, threshold) in enumerate(zip(candidates, thresholds)):
+            key = self._memo_key(candidate)
+            cost, exact = self.memo_.get(key, (None, False))
+            if cost is not None and (exact or cost > threshold):
+                costs[index] = cost
+            else:
+                entry = pending.setdefault(key, [candidate, threshold, []])
+                entry[1] = max(entry[1], threshold)
+                entry[2].append(index)
+        if pending:
+            keys = list(pending.keys())
+            batch = np.array([pending[key][0] for key in keys])
+            batch_costs, batch_exact = self._simulate_batch(batch, np.array([pending[key][1] for key in keys]))
+            for key, candidate, cost, exact in zip(keys, batch, batch_costs, batch_exact):
+                self.memo_[key] = (cost, exact)
+                costs[pending[key][2]] = cost
+                self.history_.append((dict(zip(self.param_names, candidate)), cost, exact))
+                if exact and cost < self.best_cost_:
+                    self.best_cost_ = cost
+                    self.best_params_ = dict(zip(self.param_names, candidate))
+        return costs
+
+    def gradient(self, x, step=1e-4):
+        """
+        Finite-difference gradient - all perturbed candidates are evaluated in one batch
+        @param x: parameter values - shape (d,)
+        @param step: step relative to the parameter range
+        @return: cost at x, gradient - shape (d,)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        steps = step * (self.bounds[:, 1] - self.bounds[:, 0])
+        # Step backwards at the upper bound
+        steps = np.where(x + steps > self.bounds[:, 1], -steps, steps)
+        candidates = np.vstack([x, x + np.diag(steps)])
+        costs = self.evaluate_batch(candidates, thresholds=np.full(len(candidates), np.inf))
+        return costs[0], (costs[1:] - costs[0]) / steps
+
+    def minimize_differential_evolution(self, population_size=None, max_generations=100, mutation=0.8, crossover=0.9,
+                                        tol=1e-6, seed=None):
+        """
+        Differential evolution (rand/1/bin) - each generation is evaluated as one batch.
+        Trials only have to beat their parent, so hopeless trials are stopped early.
+        @param population_size: number of candidates per generation - default: 10 * number of parameters
+        @param max_generations: maximum number of generations
+        @param mutation: differential weight
+        @param crossover: crossover probability
+        @param tol: relative tolerance of population costs for convergence
+        @param seed: random seed
+        @return: best parameters, best cost
+        """
+        rng = np.random.default_rng(seed)
+        num_params = len(self.param_names)
+        population_size = population_size if population_size else max(10 * num_params, 5)
+        population = rng.random((population_size, num_params))
+        costs = self.evaluate_batch(self._denormalize(population), thresholds=np.full(population_size, np.inf))
+        for _ in range(max_generations):
+            donors = np.array([rng.choice(np.delete(np.arange(population_size), index), 3, replace=False)
+                               for index in range(population_size)])
+            mutants = np.clip(population[donors[:, 0]] + mutation * (population[donors[:, 1]] - population[donors[:, 2]]), 0, 1)
+            crossover_mask = rng.random((population_size, num_params)) < crossover
+            crossover_mask[np.arange(population_size), rng.integers(num_params, size=population_size)] = True
+            trials = np.where(crossover_mask, mutants, population)
+            trial_costs = self.evaluate_batch(self._denormalize(trials), thresholds=costs)
+            improved = trial_costs <= costs
+            population[improved] = trials[improved]
+            costs[improved] = trial_costs[improved]
+            if np.all(np.isfinite(costs)) and np.std(costs) <= tol * abs(np.mean(costs)):
+                break
+        return self.best_params_, self.best_cost_
+
+    def minimize_gradient(self, x0: dict, max_iterations=50, step=1e-4, initial_step_length=0.1, num_step_lengths=6,
+                          tol=1e-9):
+        """
+        Projected gradient descent with parallel finite-difference gradients and a batched line search:
+        all step lengths of an iteration are evaluated in one batch.
+        @param x0: start parameters - dict {param name: value}
+        @param max_iterations: maximum number of iterations
+        @param step: finite-difference step relative to the parameter range
+        @param initial_step_length: largest step length relative to the parameter range
+        @param num_step_lengths: number of step lengths per line search - halved each time
+        @param tol: minimum cost improvement
+        @return: best parameters, best cost
+        """
+        x = np.array([x0[name] for name in self.param_names], dtype=np.float64)
+        param_range = self.bounds[:, 1] - self.bounds[:, 0]
+        for _ in range(max_iterations):
+            cost, gradient = self.gradient(x, step)
+            # Gradient in normalized coordinates
+            direction = gradient * param_range
+            norm = np.linalg.norm(direction)
+            if not np.isfinite(norm) or norm == 0:
+                break
+            step_lengths = initial_step_length * 0.5 ** np.arange(num_step_lengths)
+            candidates = np.clip(x - np.outer(step_lengths, direction / norm * param_range), self.bounds[:, 0], self.bounds[:, 1])
+            candidate_costs = self.evaluate_batch(candidates, thresholds=np.full(len(candidates), cost))
+            best_index = np.argmin(candidate_costs)
+            if candidate_costs[best_index] > cost - tol:
+                break
+            x = candidates[best_index]
+        return self.best_params_, self.best_cost_
+
+    ######################################## Private methods ###########################################################
+
+    def _simulate_batch(self, candidates, thresholds):
+        """
+        Simulate candidates
+        @return: costs, flags if costs are exact (False: simulation was stopped early)
+        """
+        self.num_simulations_ += len(candidates)
+        params_list = [dict(zip(self.param_names, candidate)) for candidate in candidates]
+        if hasattr(self.simulators[0], "run_ensemble"):
+            return self._simulate_ensemble(params_list, thresholds)
+
+        free_simulators = queue.Queue()
+        for simulator in self.simulators:
+            free_simulators.put(simulator)
+
+        def simulate(index):
+            simulator = free_simulators.get()
+            try:
+                results = simulator.run_simulation(self.trajectory_names, additional_params=params_list[index],
+                                                   out_file_name=f"calibration_{index}", **self.simulation_kwargs)
+            finally:
+                free_simulators.put(simulator)
+            if results is None:
+                return np.inf
+            return self._cost(simutils.time_index_to_seconds(results.index), results[self.trajectory_names].to_numpy()[None])[0]
+
+        with ThreadPoolExecutor(max_workers=len(self.simulators)) as executor:
+            costs = np.array(list(executor.map(simulate, range(len(candidates)))))
+        return costs, np.ones(len(candidates), dtype=bool)
+
+    def _simulate_ensemble(self, params_list, thresholds):
+        simulator = self.simulators[0]
+        start_values = dict(simulator.start_values_) if simulator.start_values_ else {}
+        states = [self._create_stopping_state(threshold) for threshold in thresholds]
+        step_finished = (lambda index, time, recorder: self._check_partial_cost(states[index], recorder)) \
+            if self.early_stopping else None
+        time, results = simulator.run_ensemble([{**start_values, **params} for params in params_list],
+                                               output_names=self.trajectory_names, step_finished=step_finished)
+        costs = self._cost(time, results)
+        stopped = np.array([state["stopped"] for state in states])
+        costs[stopped] = [state["partial_cost"] for state, is_stopped in zip(states, stopped) if is_stopped]
+        self.num_stopped_ += int(np.sum(stopped))
+        return costs, ~stopped
+
+    def _cost(self, time, results):
+        """
+        Weighted mean squared error on the reference time grid - vectorized over points, time and variables
+        @param time: simulation time in s - shape (t,)
+        @param results: simulation results - shape (points, t, variables)
+        @return: costs - shape (points,)
+        """
+        if not np.array_equal(time, self.reference_time_):
+            results = np.stack([np.stack([np.interp(self.reference_time_, time, point[:, var_index])
+                                          for var_index in range(point.shape[1])], axis=-1) for point in results])
+        costs = np.mean((results - self.reference_values_) ** 2, axis=1) @ self.weights_
+        return np.where(np.isfinite(costs), costs, np.inf)
+
+    @staticmethod
+    def _create_stopping_state(threshold):
+        return {"threshold": threshold, "row": 0, "reference_index": 0, "partial_cost": 0.0, "stopped": False, "columns": None}
+
+    def _check_partial_cost(self, state, recorder):
+        """
+        Update lower bound of the cost with the newly recorded steps
+        @return: False if the simulation can be stopped
+        """
+        if len(recorder.rows) - state["row"] < self.check_interval:
+            return True
+        if state["columns"] is None:
+            names = [column[0] for column in recorder.cols]
+            state["columns"] = [0] + [names.index(name) for name in self.trajectory_names]
+        # Include last processed row to interpolate across the chunk boundary
+        rows = np.array(recorder.rows[max(state["row"] - 1, 0):], dtype=np.float64)[:, state["columns"]]
+        state["row"] = len(recorder.rows)
+        stop_index = np.searchsorted(self.reference_time_, rows[-1, 0], side="right")
+        if stop_index > state["reference_index"]:
+            reference_slice = slice(state["reference_index"], stop_index)
+            values = np.stack([np.interp(self.reference_time_[reference_slice], rows[:, 0], rows[:, var_index])
+                               for var_index in range(1, rows.shape[1])], axis=-1)
+            squared_errors = np.sum((values - self.reference_values_[reference_slice]) ** 2, axis=0)
+            state["partial_cost"] += squared_errors @ self.weights_ / len(self.reference_time_)
+            state["reference_index"] = stop_index
+        if state["partial_cost"] > state["threshold"]:
+            state["stopped"] = True
+            return False
+        return True
+
+    def _memo_key(self, candidate):
+        return tuple(np.round(candidate, self.memo_decimals))
+
+    def _denormalize(self, x):
+        return self.bounds[:, 0] + x * (self.bounds[:, 1] - self.bounds[:, 0])
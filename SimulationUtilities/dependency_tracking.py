@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+
+
+class DependencyTracker:
+    """
+    Change-aware bookkeeping for incremental re-simulation.
+    For each result, the tracker stores the hashes of the source files (.mo, .fmu) of the simulated model
+    and a hash of all simulation inputs (parameters, initialization, additional parameters, input data).
+    A result is up to date if none of these hashes changed and the result files still exist.
+    The manifest is stored as JSON file.
+    """
+    manifest_path = ""
+    manifest = None
+
+    def __init__(self, manifest_path="dependencies.json"):
+        self.manifest_path = manifest_path
+        self.manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                self.manifest = json.load(f)
+
+    def is_up_to_date(self, result_name: str, source_hashes: dict, input_hash: str):
+        """
+        Check if a stored result can be reused
+        @param result_name: Name of result
+        @param source_hashes: Current hashes of the source files - {path: hash}
+        @param input_hash: Current hash of the simulation inputs
+        @return: True if the result exists and no dependency changed
+        """
+        entry = self.manifest.get(result_name, None)
+        if entry is None:
+            return False
+        if entry["inputs"] != input_hash or entry["sources"] != source_hashes:
+            return False
+        return all(os.path.exists(path) for path in entry["result_files"])
+
+    def record(self, result_name: str, model_name: str, source_hashes: dict, input_hash: str, result_files: list):
+        """
+        Record dependencies of a result and store the manifest
+        @param result_name: Name of result
+        @param model_name: Full name of simulated model
+        @param source_hashes: Hashes of the source files the result depends on - {path: hash}
+        @param input_hash: Hash of the simulation inputs
+        @param result_files: Paths of the stored result files
+        """
+        self.manifest[result_name] = {"model": model_name, "sources": source_hashes, "inputs": input_hash,
+                                      "result_files": [os.path.abspath(path) for path in result_files]}
+        self.save()
+
+    def invalidate(self, result_name=None):
+        """
+        Remove result from manifest - all results if result_name is None
+        """
+        if result_name is None:
+            self.manifest = {}
+        else:
+            self.manifest.pop(result_name, None)
+        self.save()
+
+    def get_dependent_results(self, source_path: str):
+        """
+        Get names of all results depending on a source file
+        @param source_path: Path of source file
+        @return: list of result names
+        """
+        source_path = os.path.abspath(source_path)
+        return [name for name, entry in self.manifest.items() if source_path in entry["sources"]]
+
+    def save(self):
+        with open(self.manifest_path, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+
+    ################################### Hashing ########################################################################
+
+    @staticmethod
+    def hash_file(path: str, block_size=1 << 20):
+        """
+        Hash file content
+        @param path: Path to file
+        @return: sha256 hex digest
+        """
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def hash_inputs(**inputs):
+        """
+        Hash simulation inputs. Arrays and dataframes are hashed by their bytes, everything else by its JSON repr.
+        @return: sha256 hex digest
+        """
+        input_hash = hashlib.sha256()
+        for key in sorted(inputs.keys()):
+            input_hash.update(key.encode())
+            value = inputs[key]
+            if hasattr(value, "to_records"):
+                value = value.to_records()
+            if hasattr(value, "tobytes"):
+                input_hash.update(str(value.dtype).encode())
+                input_hash.update(value.tobytes())
+            else:
+                input_hash.update(json.dumps(value, sort_keys=True, default=str).encode())
+        return input_hash.hexdigest()
+
+    @classmethod
+    def hash_sources(cls, source_paths: list):
+        """
+        Hash source files
+        @param source_paths: list of file paths
+        @return: dict {abspath: hash}
+        """
+        return {os.path.abspath(path): cls.hash_file(path) for path in sorted(set(source_paths)) if os.path.isfile(path)}
+
+    ################################### Model dependencies #############################################################
+
+    @staticmethod
+    def find_package_files(package_paths: list, extensions=(".mo",)):
+        """
+        Collect all source files of the packages.
+        @param package_paths: Paths to package.mo files, package directories, single .mo files or FMUs
+        @return: dict {full class name: file path} - FMUs are stored under their file name
+        """
+        class_files = {}
+        for path in package_paths:
+            if not path:
+                continue
+            if os.path.isfile(path) and os.path.basename(path) != "package.mo":
+                class_files[os.path.splitext(os.path.basename(path))[0]] = path
+                continue
+            package_dir = os.path.dirname(path) if os.path.isfile(path) else path
+            package_root = os.path.dirname(os.path.abspath(package_dir))
+            for dirpath, _, filenames in os.walk(package_dir):
+                for filename in filenames:
+                    if filename.endswith(extensions):
+                        file_path = os.path.join(dirpath, filename)
+                        class_path = os.path.relpath(file_path, package_root)
+                        class_path = os.path.dirname(class_path) if filename == "package.mo" else os.path.splitext(class_path)[0]
+                        class_files[class_path.replace(os.sep, ".")] = file_path
+        return class_files
+
+    @classmethod
+    def find_model_sources(cls, model_name_full: str, package_paths: list):
+        """
+        Find the source files a model depends on.
+        Class references in the model file are resolved against the package files - transitively.
+        References to classes nested in a file are resolved by their longest prefix that is a file class.
+        The package.mo files of all enclosing packages are always included.
+        If the model file cannot be found, all package files are returned.
+        @param model_name_full: Full model name, e.g. Package.Sub.Model
+        @param package_paths: Paths to package.mo files, package directories or FMUs
+        @return: list of file paths
+        """
+        class_files = cls.find_package_files(package_paths)
+        if model_name_full not in class_files:
+            return list(class_files.values())
+        identifier = re.compile(r"[A-Za-z_][\w.]*")
+        # Map each suffix of a class name to the class - resolves relative references
+        suffix_map = {}
+        for name in class_files.keys():
+            parts = name.split(".")
+            for i in range(len(parts)):
+                suffix_map.setdefault(".".join(parts[i:]), set()).add(name)
+        visited = set()
+        to_visit = [model_name_full]
+        while to_visit:
+            class_name = to_visit.pop()
+            if class_name in visited:
+                continue
+            visited.add(class_name)
+            parts = class_name.split(".")
+            to_visit += [".".join(parts[:i]) for i in range(1, len(parts)) if ".".join(parts[:i]) in class_files]
+            with open(class_files[class_name], "r", errors="ignore") as f:
+                tokens = set(identifier.findall(f.read()))
+            for token in tokens:
+                # Classes nested in a file (e.g. Pkg.Types.Temp in Types.mo) - longest prefix that is a file class
+                parts = token.split(".")
+                for i in range(len(parts), 0, -1):
+                    matches = suffix_map.get(".".join(parts[:i]), ())
+                    if matches:
+                        to_visit += [name for name in matches if name not in visited]
+                        break
+        return [class_files[name] for name in visited]
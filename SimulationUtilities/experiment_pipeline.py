@@ -0,0 +1,111 @@
+import os
+import queue
+import threading
+
+
+class ExperimentPipeline:
+    """
+    Pipelined experiment runner.
+    The simulator runs the experiments (init -> simulate) back to back on the calling thread.
+    As soon as the result file of an experiment exists, result extraction, csv storage and plotting
+    are handed to background workers through a bounded queue, and the next experiment is started.
+    Experiments can be chained: each experiment is initialized from the result of the previous one - simulators with
+    Dymola result files import the result file, all others (e.g. FMUs) get the final state (see ModelicaSimulator.set_initial_state).
+    The initialization parameters of the simulator are restored afterwards.
+    Parameters:
+        - simulator: ModelicaSimulator
+        - trajectory_names: names of trajectories to extract
+        - num_workers: number of post-processing workers
+        - queue_size: maximum number of experiments waiting for post-processing
+        - store_csv: store results to csv
+        - plot_enabled: plot results
+        - chain_experiments: initialize each experiment from the result of the previous one
+    """
+    # Matplotlib is not thread-safe - plots are created one at a time
+    plot_lock = threading.Lock()
+
+    def __init__(self, simulator, trajectory_names: list, num_workers=2, queue_size=2, store_csv=True,
+                 plot_enabled=False, chain_experiments=True):
+        self.simulator = simulator
+        self.trajectory_names = trajectory_names
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.store_csv = store_csv
+        self.plot_enabled = plot_enabled
+        self.chain_experiments = chain_experiments
+        self.errors = []
+
+    def run(self, sim_params_list: list, exp_prefix="exp", **kwargs):
+        """
+        Run experiments
+        @param sim_params_list: list of simulation parameters, e.g. from SimulationParameters.create_params
+        @param exp_prefix: prefix of experiment names
+        Optional arguments: passed to the simulation
+        @return: list of results - one dataframe per experiment
+        """
+        results = [None] * len(sim_params_list)
+        self.errors = []
+        task_queue = queue.Queue(maxsize=self.queue_size)
+        workers = [threading.Thread(target=self._post_process, args=(task_queue, results), daemon=True)
+                   for _ in range(self.num_workers)]
+        for worker in workers:
+            worker.start()
+        # Chaining modifies a copy of the initialization parameters on the simulator
+        warm_start_backup = self.simulator._get_warm_start_backup()
+        try:
+            previous_out_file_name = None
+            for index, sim_params in enumerate(sim_params_list):
+                exp_name = f"{exp_prefix}_{index}"
+                out_file_name = f'{self.simulator.result_filename}_{exp_name}'
+                self.simulator.set_sim_params(sim_params)
+                if self.chain_experiments and previous_out_file_name is not None:
+                    self._chain(previous_out_file_name, exp_name)
+                self.simulator._init_experiment(exp_name, **kwargs)
+                self.simulator._simulate_model(out_file_name=out_file_name, **self.simulator._get_experiment_kwargs(exp_name), **kwargs)
+                # Blocks if the workers are behind - bounds memory
+                task_queue.put((index, out_file_name, self.simulator._get_result_reader(self.trajectory_names, out_file_name=out_file_name)))
+                previous_out_file_name = out_file_name
+        finally:
+            for _ in workers:
+                task_queue.put(None)
+            for worker in workers:
+                worker.join()
+            self.simulator._restore_warm_start_backup(warm_start_backup)
+        for error in self.errors:
+            print(f"Post-processing failed: {error}")
+        return results
+
+    ######################################## Private methods ###########################################################
+
+    def _chain(self, previous_out_file_name, exp_name):
+        """
+        Initialize the next experiment from the previous one - init file if the simulator writes Dymola result files,
+        final state otherwise (init files are ignored by e.g. FMU simulators)
+        """
+        result_path = self.simulator._get_result_file_path(previous_out_file_name)
+        if result_path is not None and result_path.endswith(".mat"):
+            self.simulator.set_init_file(previous_out_file_name)
+            self.simulator.use_init_file(True)
+        else:
+            self.simulator.set_initial_state(self.simulator.get_final_state(out_file_name=previous_out_file_name), exp_name)
+
+    def _post_process(self, task_queue, results):
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            index, out_file_name, read_results = task
+            try:
+                simulation_results = read_results()
+                results[index] = simulation_results
+                if simulation_results is None:
+                    continue
+                if self.store_csv:
+                    results_path = os.path.join(self.simulator.get_data_dir(abspath=True), f"{out_file_name}.csv")
+                    simulation_results.to_csv(results_path, sep=";", index_label="Zeitraum", date_format='%d.%m.%Y %H:%M')
+                if self.plot_enabled:
+                    with self.plot_lock:
+                        self.simulator.plot_simulation_results(simulation_results, out_file_name=out_file_name,
+                                                               show_legend=True, show_ylabel=True)
+            except Exception as ex:
+                self.errors.append(ex)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import stat
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import simulation_utils as simutils
+from .result_files import write_mat_v4
+
+
+class InputTableCache:
+    """
+    Content-addressed cache of compiled simulation inputs.
+    Inputs (dataframe, structured array or dict of arrays with a time column) are converted once into
+    - CombiTimeTable-compatible MAT v4 files (Dymola) or
+    - FMU input arrays stored as .npy (fmpy)
+    The file name is the hash of the content, so identical inputs are compiled once and shared read-only
+    by all sweep points, experiments and workers.
+    Parameters:
+        - cache_dir: directory of compiled inputs
+    Additional Methods:
+    - compile_table
+    - compile_fmu_input
+    - get_table_modifier
+    """
+    cache_dir = "InputTables"
+    lock = threading.Lock()
+
+    def __init__(self, cache_dir="InputTables"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def compile_table(self, inputs, table_name="inputs"):
+        """
+        Compile inputs into a MAT v4 table for CombiTimeTable (first column: time in s, then one column per signal)
+        @param inputs: pd.DataFrame (index: time), structured array or dict with field "time"
+        @param table_name: name of table matrix
+        @return: path to .mat file, list of column names - column i + 2 in CombiTimeTable
+        """
+        time, names, values = self._to_columns(inputs)
+        table = np.column_stack([time, values])
+        path = self._get_path(self._hash(table, names, table_name), "mat")
+        if not os.path.exists(path):
+            self._write_read_only(path, lambda tmp_path: write_mat_v4(tmp_path, {table_name: table}), names)
+        return path, names
+
+    def compile_fmu_input(self, inputs):
+        """
+        Compile inputs into an fmpy input array (structured array with field "time" first)
+        @param inputs: pd.DataFrame (index: time), structured array or dict with field "time"
+        @return: read-only memory-mapped structured array - shared by all runs
+        """
+        time, names, values = self._to_columns(inputs)
+        path = self._get_path(self._hash(np.column_stack([time, values]), names, "fmu"), "npy")
+        if not os.path.exists(path):
+            input_array = np.empty(len(time), dtype=np.dtype([("time", np.float64)] + [(name, np.float64) for name in names]))
+            input_array["time"] = time
+            for index, name in enumerate(names):
+                input_array[name] = values[:, index]
+            self._write_read_only(path, lambda tmp_path: self._save_npy(tmp_path, input_array), names)
+        return np.load(path, mmap_mode="r")
+
+    @staticmethod
+    def get_table_modifier(component_name: str, table_path: str, table_name="inputs"):
+        """
+        Get Modelica modifier that reads a CombiTimeTable from a compiled table
+        @param component_name: name of CombiTimeTable component
+        @param table_path: path to .mat file
+        @param table_name: name of table matrix
+        @return: modifier string, e.g. table(tableOnFile=true, tableName="inputs", fileName="...")
+        """
+        file_name = os.path.abspath(table_path).replace("\\", "/")
+        return f'{component_name}(tableOnFile=true, tableName="{table_name}", fileName="{file_name}")'
+
+    ######################################## Private methods ###########################################################
+
+    @staticmethod
+    def _to_columns(inputs):
+        """
+        Convert inputs to time vector, names and value matrix
+        """
+        if isinstance(inputs, pd.DataFrame):
+            return (simutils.time_index_to_seconds(inputs.index), [str(name) for name in inputs.columns],
+                    inputs.to_numpy(dtype=np.float64))
+        if isinstance(inputs, np.ndarray) and inputs.dtype.names:
+            names = [name for name in inputs.dtype.names if name != "time"]
+            return (np.asarray(inputs["time"], dtype=np.float64), names,
+                    np.column_stack([np.asarray(inputs[name], dtype=np.float64) for name in names]))
+        if isinstance(inputs, dict):
+            names = [name for name in inputs.keys() if name != "time"]
+            return (np.asarray(inputs["time"], dtype=np.float64), names,
+                    np.column_stack([np.asarray(inputs[name], dtype=np.float64) for name in names]))
+        raise Exception("Unsupported input format - use dataframe, structured array or dict with time.")
+
+    @staticmethod
+    def _hash(matrix, names, kind):
+        content_hash = hashlib.sha256()
+        content_hash.update(json.dumps({"names": names, "kind": kind, "shape": matrix.shape}).encode())
+        content_hash.update(np.ascontiguousarray(matrix, dtype=np.float64).tobytes())
+        return content_hash.hexdigest()[:16]
+
+    @staticmethod
+    def _save_npy(path, array):
+        with open(path, "wb") as f:
+            np.save(f, array)
+
+    def _get_path(self, content_hash, extension):
+        return os.path.join(self.cache_dir, f"{content_hash}.{extension}")
+
+    def _write_read_only(self, path, write, names):
+        """
+        Write file atomically and make it read-only - concurrent writers of the same content are safe
+        """
+        with self.lock:
+            if os.path.exists(path):
+                return
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            write(tmp_path)
+            with open(f"{os.path.splitext(path)[0]}.json", "w") as f:
+                json.dump({"names": names}, f)
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, path)
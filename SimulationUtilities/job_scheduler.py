@@ -0,0 +1,161 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+
+@dataclass
+class Job:
+    """
+    Job of the scheduler
+    - name: unique name
+    - func: function to execute - called without arguments
+    - dependencies: names of jobs that have to finish before
+    - resources: required resources, e.g. {"dymola_licenses": 1, "cores": 1, "memory": 2e9}
+    - duration_estimate: estimated duration - used for critical path prioritization
+    """
+    name: str = ""
+    func: Callable = None
+    dependencies: List[str] = field(default_factory=list)
+    resources: dict = field(default_factory=dict)
+    duration_estimate: float = 1.0
+    status: str = "pending"
+    result: object = None
+    error: Exception = None
+    start_time: float = None
+    stop_time: float = None
+
+
+class JobScheduler:
+    """
+    Dependency-aware job scheduler.
+    Jobs form a DAG through their dependencies. Ready jobs are started as soon as their resources are available,
+    jobs on the critical path (longest remaining chain of estimated durations) first.
+    Independent chains run concurrently on a thread pool.
+    Jobs depending on a failed job are skipped.
+    Parameters:
+        - resource_limits: available resources, e.g. {"dymola_licenses": 2, "cores": 8, "memory": 16e9}
+        - max_workers: maximum number of concurrent jobs
+    """
+    resource_limits = None
+    max_workers = 4
+
+    def __init__(self, resource_limits=None, max_workers=4):
+        self.resource_limits = resource_limits if resource_limits else {}
+        self.max_workers = max_workers
+        self.jobs = {}
+
+    def add_job(self, job: Job):
+        if job.name in self.jobs:
+            raise Exception(f"Job {job.name} already exists.")
+        for resource, amount in job.resources.items():
+            if amount > self.resource_limits.get(resource, float("inf")):
+                raise Exception(f"Job {job.name} requires more {resource} than available.")
+        self.jobs[job.name] = job
+        return job
+
+    def add_jobs(self, jobs: List[Job]):
+        return [self.add_job(job) for job in jobs]
+
+    def get_priorities(self):
+        """
+        Critical path priorities: estimated duration of the longest chain starting at each job
+        @return: dict {job name: priority}
+        """
+        successors = {name: [] for name in self.jobs.keys()}
+        for job in self.jobs.values():
+            for dependency in job.dependencies:
+                if dependency not in self.jobs:
+                    raise Exception(f"Dependency {dependency} of job {job.name} does not exist.")
+                successors[dependency].append(job.name)
+        priorities = {}
+        for name in self._topological_order(successors)[::-1]:
+            priorities[name] = self.jobs[name].duration_estimate + max((priorities[succ] for succ in successors[name]), default=0)
+        return priorities
+
+    def run(self):
+        """
+        Run all jobs
+        @return: dict {job name: result}
+        """
+        priorities = self.get_priorities()
+        available = {resource: limit for resource, limit in self.resource_limits.items()}
+        pending = set(name for name, job in self.jobs.items() if job.status == "pending")
+        running = set()
+        condition = threading.Condition()
+
+        def execute(job):
+            job.start_time = time.perf_counter()
+            try:
+                job.result = job.func()
+                job.status = "done"
+            except Exception as ex:
+                print(f"Job {job.name} failed: {ex}")
+                job.error = ex
+                job.status = "failed"
+            job.stop_time = time.perf_counter()
+            with condition:
+                running.discard(job.name)
+                for resource, amount in job.resources.items():
+                    if resource in available:
+                        available[resource] += amount
+                condition.notify()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            with condition:
+                while pending or running:
+                    # Skip jobs depending on failed jobs - transitively
+                    skipped = True
+                    while skipped:
+                        skipped = [name for name in pending
+                                   if any(self.jobs[dep].status in ("failed", "skipped") for dep in self.jobs[name].dependencies)]
+                        for name in skipped:
+                            self.jobs[name].status = "skipped"
+                            pending.discard(name)
+                    ready = sorted((name for name in pending if all(self.jobs[dep].status == "done" for dep in self.jobs[name].dependencies)),
+                                   key=lambda name: priorities[name], reverse=True)
+                    for name in ready:
+                        job = self.jobs[name]
+                        if len(running) >= self.max_workers:
+                            break
+                        if all(amount <= available.get(resource, float("inf")) for resource, amount in job.resources.items()):
+                            for resource, amount in job.resources.items():
+                                if resource in available:
+                                    available[resource] -= amount
+                            pending.discard(name)
+                            running.add(name)
+                            job.status = "running"
+                            executor.submit(execute, job)
+                    if pending or running:
+                        condition.wait()
+        return {name: job.result for name, job in self.jobs.items()}
+
+    def get_report(self):
+        """
+        Get job timings
+        @return: list of dicts with name, status, start and duration relative to the first job start
+        """
+        start_times = [job.start_time for job in self.jobs.values() if job.start_time is not None]
+        t_0 = min(start_times) if start_times else 0
+        return [{"name": job.name, "status": job.status,
+                 "start": job.start_time - t_0 if job.start_time is not None else None,
+                 "duration": job.stop_time - job.start_time if job.stop_time is not None else None}
+                for job in self.jobs.values()]
+
+    ######################################## Private methods ###########################################################
+
+    def _topological_order(self, successors):
+        in_degree = {name: len(job.dependencies) for name, job in self.jobs.items()}
+        order = []
+        ready = [name for name, degree in in_degree.items() if degree == 0]
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for succ in successors[name]:
+                in_degree[succ] -= 1
+                if in_degree[succ] == 0:
+                    ready.append(succ)
+        if len(order) != len(self.jobs):
+            raise Exception("Job dependencies contain a cycle.")
+        return order
@@ -0,0 +1,285 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from . import simulation_utils as simutils
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate (P-square algorithm, Jain & Chlamtac) - vectorized over an array of cells.
+    Five markers per cell - memory does not depend on the number of observations.
+    """
+    def __init__(self, probability: float, shape):
+        self.probability = probability
+        self.shape = tuple(shape)
+        self.count = 0
+        self.heights = np.empty((5,) + self.shape)
+        self.positions = np.tile(np.arange(5, dtype=np.float64).reshape((5,) + (1,) * len(self.shape)), (1,) + self.shape)
+        self.desired_positions = np.array([0, 2 * probability, 4 * probability, 2 + 2 * probability, 4])
+        self.increments = np.array([0, probability / 2, probability, (1 + probability) / 2, 1])
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.count < 5:
+            self.heights[self.count] = values
+            self.count += 1
+            if self.count == 5:
+                self.heights.sort(axis=0)
+            return
+        self.count += 1
+        heights, positions = self.heights, self.positions
+        heights[0] = np.minimum(heights[0], values)
+        heights[4] = np.maximum(heights[4], values)
+        # Cell k of the observation: heights[k] <= value < heights[k + 1]
+        cell = (values >= heights[1]).astype(int) + (values >= heights[2]) + (values >= heights[3])
+        for index in range(1, 5):
+            positions[index] += cell < index
+        self.desired_positions += self.increments
+        for index in range(1, 4):
+            self._adjust(index)
+
+    def value(self):
+        if self.count == 0:
+            return np.full(self.shape, np.nan)
+        if self.count < 5:
+            return np.quantile(self.heights[:self.count], self.probability, axis=0)
+        return self.heights[2].copy()
+
+    def _adjust(self, index):
+        heights, positions = self.heights, self.positions
+        offset = self.desired_positions[index] - positions[index]
+        step_up = positions[index + 1] - positions[index]
+        step_down = positions[index - 1] - positions[index]
+        adjust = ((offset >= 1) & (step_up > 1)) | ((offset <= -1) & (step_down < -1))
+        if not np.any(adjust):
+            return
+        sign = np.where(offset >= 0, 1.0, -1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            parabolic = heights[index] + sign / (positions[index + 1] - positions[index - 1]) * (
+                (positions[index] - positions[index - 1] + sign) * (heights[index + 1] - heights[index]) / step_up
+                + (positions[index + 1] - positions[index] - sign) * (heights[index] - heights[index - 1]) / -step_down)
+            neighbour_heights = np.where(sign > 0, heights[index + 1], heights[index - 1])
+            neighbour_positions = np.where(sign > 0, positions[index + 1], positions[index - 1])
+            linear = heights[index] + sign * (neighbour_heights - heights[index]) / (neighbour_positions - positions[index])
+        use_parabolic = (heights[index - 1] < parabolic) & (parabolic < heights[index + 1])
+        heights[index] = np.where(adjust, np.where(use_parabolic, parabolic, linear), heights[index])
+        positions[index] += np.where(adjust, sign, 0.0)
+
+
+class OnlineStatistics:
+    """
+    Online statistics of array-valued samples (e.g. time x variables) - memory does not depend on the number of samples.
+    - mean and variance: Welford's algorithm
+    - quantiles: P-square estimates
+    - exceedance counts: number of samples above a threshold per cell
+    Parameters:
+        - shape: shape of one sample
+        - quantiles: probabilities of quantile estimates
+        - thresholds: array of thresholds broadcastable to shape - NaN: no threshold
+    """
+    def __init__(self, shape, quantiles=(0.05, 0.5, 0.95), thresholds=None):
+        self.shape = tuple(shape)
+        self.count = 0
+        self.mean = np.zeros(self.shape)
+        self.m2 = np.zeros(self.shape)
+        self.minimum = np.full(self.shape, np.inf)
+        self.maximum = np.full(self.shape, -np.inf)
+        self.quantiles = {probability: P2Quantile(probability, self.shape) for probability in quantiles}
+        self.thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), self.shape) if thresholds is not None else None
+        self.exceedance_counts = np.zeros(self.shape, dtype=np.int64)
+
+    def update(self, sample):
+        sample = np.asarray(sample, dtype=np.float64)
+        self.count += 1
+        delta = sample - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (sample - self.mean)
+        np.minimum(self.minimum, sample, out=self.minimum)
+        np.maximum(self.maximum, sample, out=self.maximum)
+        for estimator in self.quantiles.values():
+            estimator.update(sample)
+        if self.thresholds is not None:
+            self.exceedance_counts += sample > self.thresholds
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.full(self.shape, np.nan)
+
+    @property
+    def standard_error(self):
+        return np.sqrt(self.variance / self.count) if self.count > 1 else np.full(self.shape, np.inf)
+
+    @property
+    def exceedance_probability(self):
+        return self.exceedance_counts / self.count if self.count else np.full(self.shape, np.nan)
+
+    def is_converged(self, rtol=1e-2, atol=0.0):
+        """
+        Check convergence of the mean: standard error <= atol + rtol * |mean| in all cells
+        """
+        if self.count < 2:
+            return False
+        return bool(np.all(self.standard_error <= atol + rtol * np.abs(self.mean)))
+
+
+class MonteCarloStudy:
+    """
+    Streaming Monte Carlo uncertainty propagation.
+    Parameters are sampled from distributions, samples are simulated in parallel batches and each result is folded into
+    online statistics as it arrives - results are not kept, so memory does not depend on the number of samples.
+    Simulation backends (same as Calibrator):
+    - simulators with run_ensemble (FMPYEnsembleSimulator): one ensemble run per batch
+    - list of simulators: one simulator per worker thread
+    - single simulator: sequential run_simulation
+    Parameters:
+        - simulators: simulator or list of simulators
+        - trajectory_names: names of evaluated trajectories
+        - distributions: dict {param name: distribution} - distribution: ("normal", mean, std), ("uniform", low, high),
+          ("lognormal", mean, sigma), ("triangular", left, mode, right) or callable(rng, size) returning samples
+        - quantiles: probabilities of quantile bands
+        - thresholds: dict {trajectory name: threshold} - exceedance counts per time step
+        - batch_size: number of samples per batch - default: 4 per simulator (ensemble: 64)
+        - seed: random seed
+    Additional Methods:
+    - run
+    - get_summary
+    """
+    batch_size = None
+
+    def __init__(self, simulators, trajectory_names: list, distributions: dict, quantiles=(0.05, 0.5, 0.95), thresholds=None,
+                 batch_size=None, seed=None, **kwargs):
+        self.simulators = simulators if isinstance(simulators, (list, tuple)) else [simulators]
+        self.trajectory_names = list(trajectory_names)
+        self.distributions = distributions
+        self.quantiles = tuple(quantiles)
+        self.thresholds = thresholds if thresholds else {}
+        self.is_ensemble = hasattr(self.simulators[0], "run_ensemble")
+        self.batch_size = batch_size if batch_size else (64 if self.is_ensemble else 4 * len(self.simulators))
+        self.rng = np.random.default_rng(seed)
+        self.simulation_kwargs = kwargs
+        self.statistics_: OnlineStatistics = None
+        self.time_ = None
+        self.num_failed_ = 0
+        self.converged_ = False
+
+    def run(self, max_samples=1000, min_samples=20, rtol=1e-2, atol=0.0):
+        """
+        Run samples until the mean of all trajectories has converged or max_samples is reached
+        @param max_samples: maximum number of samples
+        @param min_samples: minimum number of samples before convergence is checked
+        @param rtol: relative tolerance of the standard error of the mean
+        @param atol: absolute tolerance of the standard error of the mean
+        @return: summary dataframe (see get_summary)
+        """
+        num_samples = 0
+        self.converged_ = False
+        while num_samples < max_samples:
+            batch = self._sample(min(self.batch_size, max_samples - num_samples))
+            self._simulate_batch(batch)
+            num_samples += len(batch)
+            if self.statistics_ is not None and self.statistics_.count >= min_samples and self.statistics_.is_converged(rtol, atol):
+                self.converged_ = True
+                break
+        return self.get_summary()
+
+    def get_summary(self):
+        """
+        Get statistics per time step
+        @return: dataframe - index: time in s, columns: (statistic, trajectory name),
+        statistics: mean, std, min, max, q<probability>, p_exceed
+        """
+        if self.statistics_ is None:
+            raise Exception("No samples - run the study first.")
+        statistics = self.statistics_
+        frames = {"mean": statistics.mean, "std": np.sqrt(statistics.variance), "min": statistics.minimum, "max": statistics.maximum}
+        frames.update({f"q{probability:g}": estimator.value() for probability, estimator in statistics.quantiles.items()})
+        if self.thresholds:
+            frames["p_exceed"] = statistics.exceedance_probability
+        return pd.concat({name: pd.DataFrame(values, index=self.time_, columns=self.trajectory_names)
+                          for name, values in frames.items()}, axis=1)
+
+    ######################################## Private methods ###########################################################
+
+    def _sample(self, num_samples):
+        """
+        Sample parameters
+        @return: list of dicts {param name: value}
+        """
+        columns = {name: self._sample_distribution(distribution, num_samples) for name, distribution in self.distributions.items()}
+        return [{name: float(values[index]) for name, values in columns.items()} for index in range(num_samples)]
+
+    def _sample_distribution(self, distribution, num_samples):
+        if callable(distribution):
+            return np.asarray(distribution(self.rng, num_samples), dtype=np.float64)
+        kind, *args = distribution
+        if kind == "normal":
+            return self.rng.normal(args[0], args[1], num_samples)
+        if kind == "uniform":
+            return self.rng.uniform(args[0], args[1], num_samples)
+        if kind == "lognormal":
+            return self.rng.lognormal(args[0], args[1], num_samples)
+        if kind == "triangular":
+            return self.rng.triangular(args[0], args[1], args[2], num_samples)
+        raise Exception(f"Unknown distribution {kind}.")
+
+    def _simulate_batch(self, params_list):
+        """
+        Simulate batch and fold the results into the statistics
+        """
+        if self.is_ensemble:
+            simulator = self.simulators[0]
+            start_values = dict(simulator.start_values_) if simulator.start_values_ else {}
+            time, results = simulator.run_ensemble([{**start_values, **params} for params in params_list],
+                                                   output_names=self.trajectory_names)
+            for point_results in results:
+                self._fold(time, point_results)
+            return
+
+        free_simulators = queue.Queue()
+        for simulator in self.simulators:
+            free_simulators.put(simulator)
+
+        def simulate(index):
+            simulator = free_simulators.get()
+            try:
+                results = simulator.run_simulation(self.trajectory_names, additional_params=params_list[index],
+                                                   out_file_name=f"monte_carlo_{index}", **self.simulation_kwargs)
+            finally:
+                free_simulators.put(simulator)
+            if results is None:
+                return None
+            return simutils.time_index_to_seconds(results.index), results[self.trajectory_names].to_numpy(dtype=np.float64)
+
+        with ThreadPoolExecutor(max_workers=len(self.simulators)) as executor:
+            futures = [executor.submit(simulate, index) for index in range(len(params_list))]
+            # Fold results as they arrive - finished results are released immediately
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as ex:
+                    print(f"Simulation failed: {ex}")
+                    result = None
+                if result is None:
+                    self.num_failed_ += 1
+                else:
+                    self._fold(*result)
+
+    def _fold(self, time, values):
+        """
+        Add one sample to the statistics - results are interpolated onto the time grid of the first sample
+        @param time: time in s - shape (t,)
+        @param values: results - shape (t, variables)
+        """
+        if not np.all(np.isfinite(values)):
+            self.num_failed_ += 1
+            return
+        if self.statistics_ is None:
+            self.time_ = np.asarray(time, dtype=np.float64)
+            thresholds = np.array([self.thresholds.get(name, np.nan) for name in self.trajectory_names])
+            self.statistics_ = OnlineStatistics(values.shape, self.quantiles, thresholds if self.thresholds else None)
+        elif len(time) != len(self.time_) or not np.allclose(time, self.time_):
+            values = np.stack([np.interp(self.time_, time, values[:, index]) for index in range(values.shape[1])], axis=-1)
+        self.statistics_.update(values)
@@ -0,0 +1,240 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import simulation_utils as simutils
+from .result_files import DymolaResultFile
+
+
+class RegressionComparison:
+    """
+    Regression comparison of simulation results against baseline results.
+    Both results are streamed chunk by chunk from the result files (.mat and .npy are memory-mapped, only the time
+    column is read completely). Each chunk of the baseline is interpolated onto the time grid of the result (vectorized)
+    and compared with per-variable tolerances: |result - baseline| <= atol + rtol * |baseline|.
+    Only the failing windows (contiguous failing time ranges) and summary statistics are reported.
+    Result pairs (e.g. sweep points) are compared in parallel.
+    Parameters:
+        - trajectory_names: names of compared trajectories
+        - tolerances: dict {trajectory name: (atol, rtol)} - default: (atol, rtol) for all trajectories
+        - atol: default absolute tolerance
+        - rtol: default relative tolerance
+        - chunk_size: number of time steps per chunk
+        - max_workers: number of parallel comparisons - default: executor default
+        - use_processes: compare in a process pool instead of a thread pool
+    Additional Methods:
+    - compare
+    - compare_many
+    - compare_directories
+    """
+    atol = 1e-8
+    rtol = 1e-5
+    chunk_size = 65536
+
+    def __init__(self, trajectory_names: list, tolerances=None, atol=1e-8, rtol=1e-5, chunk_size=65536, max_workers=None,
+                 use_processes=False):
+        self.trajectory_names = list(trajectory_names)
+        self.atol = atol
+        self.rtol = rtol
+        self.tolerances = {name: (tolerances or {}).get(name, (atol, rtol)) for name in self.trajectory_names}
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.summary_ = None
+        self.windows_ = None
+        self.errors_ = {}
+
+    def compare(self, result_path: str, baseline_path: str):
+        """
+        Compare one result file against its baseline
+        @return: summary (one row per trajectory), failing windows
+        """
+        return self.compare_many({os.path.basename(result_path): (result_path, baseline_path)})
+
+    def compare_many(self, pairs: dict):
+        """
+        Compare result files against baselines in parallel
+        @param pairs: dict {key, e.g. sweep value: (result path, baseline path)}
+        @return: summary - index (key, trajectory), columns: num_points, num_failed, max_abs_error, max_rel_error, rmse,
+        time_range_mismatch, missing, passed - pairs with a missing, unreadable or unsupported result or baseline file
+        fail as missing, the reason is stored in errors_ {key: message}
+        failing windows - columns: key, trajectory, start_time, end_time, num_points, max_abs_error
+        """
+        keys = list(pairs.keys())
+        missing_files = {key: [path for path in pairs[key] if not os.path.exists(path)] for key in keys}
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=self.max_workers) as executor:
+            futures = {key: executor.submit(compare_result_files, pairs[key][0], pairs[key][1], self.trajectory_names,
+                                            self.tolerances, self.chunk_size) for key in keys if not missing_files[key]}
+            outcomes = []
+            self.errors_ = {}
+            for key in keys:
+                if missing_files[key]:
+                    self.errors_[key] = f"Missing result files: {missing_files[key]}"
+                    outcomes.append((_get_missing_rows(self.trajectory_names), []))
+                    continue
+                try:
+                    outcomes.append(futures[key].result())
+                except Exception as ex:
+                    # One unreadable file must not abort the comparison of all other pairs
+                    self.errors_[key] = f"{type(ex).__name__}: {ex}"
+                    outcomes.append((_get_missing_rows(self.trajectory_names), []))
+        summary_rows = [{"key": key, **row} for key, (rows, _) in zip(keys, outcomes) for row in rows]
+        window_rows = [{"key": key, **row} for key, (_, windows) in zip(keys, outcomes) for row in windows]
+        self.summary_ = pd.DataFrame(summary_rows).set_index(["key", "trajectory"]) if summary_rows else pd.DataFrame()
+        self.windows_ = pd.DataFrame(window_rows, columns=["key", "trajectory", "start_time", "end_time", "num_points",
+                                                           "max_abs_error"])
+        return self.summary_, self.windows_
+
+    def compare_directories(self, result_dir: str, baseline_dir: str, pattern="*.mat"):
+        """
+        Compare all result files of a directory against the files with the same name in a baseline directory
+        @param pattern: file name pattern
+        @return: see compare_many - key: file name
+        """
+        pairs = {}
+        for result_path in sorted(glob.glob(os.path.join(result_dir, pattern))):
+            baseline_path = os.path.join(baseline_dir, os.path.basename(result_path))
+            if os.path.exists(baseline_path):
+                pairs[os.path.basename(result_path)] = (result_path, baseline_path)
+            else:
+                print(f"No baseline for {result_path}.")
+        return self.compare_many(pairs)
+
+    @property
+    def passed(self):
+        return self.summary_ is not None and bool(self.summary_["passed"].all())
+
+
+class ResultStream:
+    """
+    Chunk-wise access to a result file - .mat (Dymola), .npy (memory-mapped FMU result) or .csv
+    """
+    def __init__(self, result_path: str):
+        extension = os.path.splitext(result_path)[1].lower()
+        if extension == ".mat":
+            self.result_file = DymolaResultFile(result_path)
+            self.names = set(self.result_file.names)
+            self.time = self.result_file.get_trajectory("Time")
+            self._read = lambda name, rows: self.result_file.get_trajectory(name, rows)
+        elif extension == ".npy":
+            results = simutils.read_memmap_result(result_path)
+            self.names = set(results.columns)
+            self.time = results.index.to_numpy(dtype=np.float64)
+            self._read = lambda name, rows: results[name].to_numpy(dtype=np.float64)[rows]
+        elif extension == ".csv":
+            results = simutils.read_result_csv(result_path)
+            self.names = set(results.columns)
+            self.time = simutils.time_index_to_seconds(results.index)
+            self._read = lambda name, rows: results[name].to_numpy(dtype=np.float64)[rows]
+        else:
+            raise Exception(f"Unsupported result file {result_path}.")
+
+    def read(self, names: list, rows: slice):
+        """
+        @return: array of shape (rows, names)
+        """
+        return np.stack([self._read(name, rows) for name in names], axis=-1)
+
+
+def compare_result_files(result_path: str, baseline_path: str, trajectory_names: list, tolerances: dict, chunk_size=65536):
+    """
+    Compare a result file against a baseline chunk by chunk - see RegressionComparison
+    @param tolerances: dict {trajectory name: (atol, rtol)}
+    @return: list of summary rows, list of failing windows
+    """
+    result, baseline = ResultStream(result_path), ResultStream(baseline_path)
+    missing = [name for name in trajectory_names if name not in result.names or name not in baseline.names]
+    names = [name for name in trajectory_names if name not in missing]
+    atol = np.array([tolerances[name][0] for name in names])
+    rtol = np.array([tolerances[name][1] for name in names])
+
+    # Compare on the overlapping time range only
+    start_time, stop_time = max(result.time[0], baseline.time[0]), min(result.time[-1], baseline.time[-1])
+    time_range_mismatch = not (np.isclose(result.time[0], baseline.time[0]) and np.isclose(result.time[-1], baseline.time[-1]))
+    first_row, last_row = np.searchsorted(result.time, start_time, "left"), np.searchsorted(result.time, stop_time, "right")
+
+    num_points = max(last_row - first_row, 0)
+    num_failed = np.zeros(len(names), dtype=np.int64)
+    max_abs_error = np.zeros(len(names))
+    max_rel_error = np.zeros(len(names))
+    sum_squared_error = np.zeros(len(names))
+    windows = []
+    open_windows = [None] * len(names)
+    for chunk_start in range(first_row, last_row, chunk_size):
+        rows = slice(chunk_start, min(chunk_start + chunk_size, last_row))
+        time = result.time[rows]
+        # Baseline rows enclosing the chunk
+        baseline_rows = slice(max(np.searchsorted(baseline.time, time[0], "right") - 1, 0),
+                              np.searchsorted(baseline.time, time[-1], "left") + 1)
+        baseline_time = baseline.time[baseline_rows]
+        baseline_values = baseline.read(names, baseline_rows)
+        expected = np.stack([np.interp(time, baseline_time, baseline_values[:, index]) for index in range(len(names))], axis=-1) \
+            if len(names) else np.empty((len(time), 0))
+        values = result.read(names, rows) if len(names) else np.empty((len(time), 0))
+
+        abs_error = np.abs(values - expected)
+        # NaN in only one of both results is a failure
+        abs_error = np.where(np.isnan(values) & np.isnan(expected), 0.0, np.where(np.isnan(abs_error), np.inf, abs_error))
+        failed = abs_error > atol + rtol * np.abs(expected)
+        num_failed += failed.sum(axis=0)
+        max_abs_error = np.maximum(max_abs_error, abs_error.max(axis=0, initial=0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_error = np.where(np.abs(expected) > 0, abs_error / np.abs(expected), np.where(abs_error > 0, np.inf, 0.0))
+        max_rel_error = np.maximum(max_rel_error, rel_error.max(axis=0, initial=0.0))
+        sum_squared_error += np.sum(np.where(np.isfinite(abs_error), abs_error, 0.0) ** 2, axis=0)
+        _update_windows(windows, open_windows, names, time, failed, abs_error)
+
+    for index, window in enumerate(open_windows):
+        if window is not None:
+            windows.append(window)
+    summary = [{"trajectory": name, "num_points": num_points, "num_failed": int(failed_points),
+                "max_abs_error": float(abs_error), "max_rel_error": float(rel_error),
+                "rmse": float(np.sqrt(squared_error / num_points)) if num_points else np.nan,
+                "time_range_mismatch": time_range_mismatch, "missing": False,
+                "passed": failed_points == 0 and not time_range_mismatch}
+               for name, failed_points, abs_error, rel_error, squared_error
+               in zip(names, num_failed, max_abs_error, max_rel_error, sum_squared_error)]
+    summary += _get_missing_rows(missing, time_range_mismatch)
+    return summary, windows
+
+
+def _get_missing_rows(names, time_range_mismatch=False):
+    """
+    Summary rows of trajectories that cannot be compared - always failed
+    """
+    return [{"trajectory": name, "num_points": 0, "num_failed": 0, "max_abs_error": np.nan, "max_rel_error": np.nan,
+             "rmse": np.nan, "time_range_mismatch": time_range_mismatch, "missing": True, "passed": False} for name in names]
+
+
+def _update_windows(windows, open_windows, names, time, failed, abs_error):
+    """
+    Merge failing time steps of a chunk into contiguous windows - windows may continue across chunks
+    """
+    for index, name in enumerate(names):
+        column = failed[:, index]
+        if not column.any() and open_windows[index] is None:
+            continue
+        # Start and end positions of failing runs within the chunk
+        changes = np.diff(np.concatenate([[False], column, [False]]).astype(np.int8))
+        starts, ends = np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+        window = open_windows[index]
+        if window is not None and (len(starts) == 0 or starts[0] != 0):
+            # Open window ended before this chunk
+            windows.append(window)
+            window = None
+        for start, end in zip(starts, ends):
+            if window is not None:
+                window["end_time"] = float(time[end - 1])
+                window["num_points"] += int(end - start)
+                window["max_abs_error"] = max(window["max_abs_error"], float(abs_error[start:end, index].max()))
+            else:
+                window = {"trajectory": name, "start_time": float(time[start]), "end_time": float(time[end - 1]),
+                          "num_points": int(end - start), "max_abs_error": float(abs_error[start:end, index].max())}
+            if end < len(column):
+                windows.append(window)
+                window = None
+        open_windows[index] = window
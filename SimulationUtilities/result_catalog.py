@@ -0,0 +1,275 @@
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import simulation_utils as simutils
+from .result_files import DymolaResultFile
+from .solver_statistics import SolverStatistics
+
+
+class ResultCatalog:
+    """
+    Result catalog - local SQLite index of simulation runs.
+    For each run, the catalog stores model name, parameters (simulation, initialization and additional parameters),
+    sweep values, timings, result file paths and summary statistics per variable.
+    Parameters are additionally stored as flat (name, value) rows with an index, so runs can be found by parameter values
+    without parsing any result or parameter file.
+    Tables:
+    - runs: one row per run
+    - params: run_id, name, value (numeric) / value_text (other) - e.g. "sim.stop_time", "additional.k"
+    - variables: run_id, name, min, max, mean, std, final
+    - solver_statistics: run_id, fields of SolverStatistics
+    """
+    db_path = "results.sqlite"
+
+    def __init__(self, db_path="results.sqlite"):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_tables()
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, model_name: str, out_file_name: str, simulation_results: pd.DataFrame = None, sim_params=None,
+                init_params=None, additional_params=None, sweep_var=None, sweep_value=None, result_path=None,
+                csv_path=None, duration=None, exp_name="", simulator="", solver_statistics: SolverStatistics = None):
+        """
+        Add run to catalog
+        @param model_name: Full model name
+        @param out_file_name: Name of result
+        @param simulation_results: Results - used for variable statistics
+        @param sim_params: SimulationParameters
+        @param init_params: InitializationParameters
+        @param additional_params: dict of additional parameters
+        @param sweep_var: sweep variable - optional
+        @param sweep_value: sweep value - optional
+        @param result_path: path to result file (.mat) - optional
+        @param csv_path: path to csv file - optional
+        @param duration: simulation wall time in s
+        @param exp_name: experiment name
+        @param simulator: name of simulator class
+        @param solver_statistics: SolverStatistics of run - optional
+        @return: run id
+        """
+        params = {}
+        if sim_params is not None:
+            params.update({f"sim.{key}": val for key, val in dataclasses.asdict(sim_params).items()})
+        if init_params is not None:
+            init_dict = dataclasses.asdict(init_params)
+            params.update({f"init.{key}": val for key, val in init_dict.pop("init_variables").items()})
+            params.update({f"init.{key}": val for key, val in init_dict.items()})
+        if additional_params:
+            params.update({f"additional.{key}": val for key, val in additional_params.items()})
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (model_name, out_file_name, exp_name, simulator, sim_params, init_params, additional_params, "
+                "sweep_var, sweep_value, result_path, csv_path, created, duration) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                (model_name, out_file_name, exp_name, simulator,
+                 sim_params.to_json() if sim_params is not None else None,
+                 init_params.to_json() if init_params is not None else None,
+                 json.dumps(additional_params, default=str) if additional_params else None,
+                 sweep_var, str(sweep_value) if sweep_value is not None else None,
+                 os.path.abspath(result_path) if result_path else None,
+                 os.path.abspath(csv_path) if csv_path else None,
+                 time.time(), duration))
+            run_id = cursor.lastrowid
+            self.connection.executemany("INSERT INTO params (run_id, name, value, value_text) VALUES (?,?,?,?)",
+                                        [(run_id, name) + self._split_value(val) for name, val in params.items()])
+            if simulation_results is not None:
+                self.connection.executemany("INSERT INTO variables (run_id, name, min, max, mean, std, final) VALUES (?,?,?,?,?,?,?)",
+                                            [(run_id,) + row for row in self._compute_statistics(simulation_results)])
+            if solver_statistics is not None:
+                statistics = solver_statistics.to_dict()
+                self.connection.execute(f"INSERT INTO solver_statistics (run_id, {', '.join(statistics.keys())}) "
+                                        f"VALUES ({','.join('?' * (len(statistics) + 1))})", (run_id,) + tuple(statistics.values()))
+        return run_id
+
+    def find_runs(self, model_name=None, params=None, rel_tol=1e-9, **filters):
+        """
+        Find runs by model name, parameter values and run attributes
+        @param model_name: Full model name - optional
+        @param params: dict {param name: value} - names as in params table, e.g. {"additional.k": 2, "sim.stop_time": 3600}
+        @param rel_tol: relative tolerance for numeric parameter values
+        Optional arguments: filters on columns of runs table, e.g. exp_name="exp_1"
+        @return: dataframe of matching runs
+        """
+        conditions = []
+        args = []
+        if model_name is not None:
+            conditions.append("model_name = ?")
+            args.append(model_name)
+        for column, value in filters.items():
+            if column not in self._get_run_columns():
+                raise Exception(f"Unknown column {column}.")
+            conditions.append(f"{column} = ?")
+            args.append(value)
+        for name, value in (params or {}).items():
+            numeric_value, text_value = self._split_value(value)
+            if numeric_value is not None:
+                tolerance = abs(numeric_value) * rel_tol
+                conditions.append("run_id IN (SELECT run_id FROM params WHERE name = ? AND value BETWEEN ? AND ?)")
+                args += [name, numeric_value - tolerance, numeric_value + tolerance]
+            else:
+                conditions.append("run_id IN (SELECT run_id FROM params WHERE name = ? AND value_text = ?)")
+                args += [name, text_value]
+        query = "SELECT * FROM runs" + (" WHERE " + " AND ".join(conditions) if conditions else "")
+        with self.lock:
+            return pd.read_sql_query(query, self.connection, params=args, index_col="run_id")
+
+    def get_result_files(self, sweep_var: str, model_name=None, **filters):
+        """
+        Get result files of a sweep - e.g. as input of bulk_loader.load_results
+        @param sweep_var: sweep variable
+        @param model_name: Full model name - optional
+        Optional arguments: filters on columns of runs table
+        @return: dict {sweep value: path} - result file if it exists, csv file otherwise. Latest run per sweep value.
+        """
+        runs = self.find_runs(model_name, sweep_var=sweep_var, **filters).sort_index()
+        result_files = {}
+        for _, run in runs.iterrows():
+            path = run["result_path"] if run["result_path"] and os.path.exists(run["result_path"]) else run["csv_path"]
+            if path:
+                result_files[self._parse_value(run["sweep_value"])] = path
+        return result_files
+
+    def get_params(self, run_id: int):
+        """
+        Get all parameters of a run
+        @return: dict {name: value}
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT name, value, value_text FROM params WHERE run_id = ?", (run_id,)).fetchall()
+        return {name: value if value is not None else value_text for name, value, value_text in rows}
+
+    def get_variable_statistics(self, run_ids=None, variable_names=None):
+        """
+        Get summary statistics per variable
+        @param run_ids: list of run ids - default: all
+        @param variable_names: list of variable names - default: all
+        @return: dataframe indexed by (run_id, name)
+        """
+        conditions = []
+        args = []
+        if run_ids is not None:
+            conditions.append(f"run_id IN ({','.join('?' * len(run_ids))})")
+            args += [int(run_id) for run_id in run_ids]
+        if variable_names is not None:
+            conditions.append(f"name IN ({','.join('?' * len(variable_names))})")
+            args += list(variable_names)
+        query = "SELECT * FROM variables" + (" WHERE " + " AND ".join(conditions) if conditions else "")
+        with self.lock:
+            return pd.read_sql_query(query, self.connection, params=args, index_col=["run_id", "name"])
+
+    def rank_runs(self, by="cpu_time", ascending=False, limit=None, **filters):
+        """
+        Rank runs by solver cost - e.g. to find pathological sweep points
+        @param by: field of SolverStatistics
+        @param ascending: sort order - default: most expensive first
+        @param limit: maximum number of runs
+        Optional arguments: filters on columns of runs table, e.g. sweep_var="k"
+        @return: dataframe of runs joined with their solver statistics
+        """
+        if by not in [field.name for field in dataclasses.fields(SolverStatistics)]:
+            raise Exception(f"Unknown statistic {by}.")
+        run_columns = self._get_run_columns()
+        conditions = []
+        for column in filters.keys():
+            if column not in run_columns:
+                raise Exception(f"Unknown column {column}.")
+            conditions.append(f"runs.{column} = ?")
+        query = ("SELECT runs.*, solver_statistics.* FROM runs JOIN solver_statistics USING (run_id)" +
+                 (" WHERE " + " AND ".join(conditions) if conditions else "") +
+                 f" ORDER BY solver_statistics.{by} IS NULL, solver_statistics.{by} {'ASC' if ascending else 'DESC'}" +
+                 (f" LIMIT {int(limit)}" if limit is not None else ""))
+        with self.lock:
+            ranking = pd.read_sql_query(query, self.connection, params=list(filters.values()))
+        return ranking.loc[:, ~ranking.columns.duplicated()].set_index("run_id")
+
+    def load(self, run_id: int, columns: list):
+        """
+        Load columns of a run directly from the result file (.mat or .npy if available, csv otherwise)
+        @param run_id: run id
+        @param columns: trajectory names
+        @return: dataframe
+        """
+        with self.lock:
+            result_path, csv_path = self.connection.execute("SELECT result_path, csv_path FROM runs WHERE run_id = ?",
+                                                            (int(run_id),)).fetchone()
+        if result_path and os.path.exists(result_path):
+            if result_path.endswith(".npy"):
+                return simutils.read_memmap_result(result_path)[columns]
+            return DymolaResultFile(result_path).to_dataframe(columns)
+        if csv_path and os.path.exists(csv_path):
+            return simutils.read_result_csv(csv_path, usecols=lambda name: name in ["Zeitraum"] + list(columns))
+        raise FileNotFoundError(f"No result file found for run {run_id}.")
+
+    ######################################## Private methods ###########################################################
+
+    def _create_tables(self):
+        with self.lock, self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT, model_name TEXT, out_file_name TEXT, exp_name TEXT,
+                    simulator TEXT, sim_params TEXT, init_params TEXT, additional_params TEXT, sweep_var TEXT,
+                    sweep_value TEXT, result_path TEXT, csv_path TEXT, created REAL, duration REAL);
+                CREATE TABLE IF NOT EXISTS params (run_id INTEGER, name TEXT, value REAL, value_text TEXT);
+                CREATE TABLE IF NOT EXISTS variables (run_id INTEGER, name TEXT, min REAL, max REAL, mean REAL, std REAL, final REAL);
+                CREATE TABLE IF NOT EXISTS solver_statistics (
+                    run_id INTEGER PRIMARY KEY, wall_time REAL, cpu_time REAL, init_time REAL, num_steps INTEGER,
+                    num_rejected_steps INTEGER, num_state_events INTEGER, num_time_events INTEGER, num_step_events INTEGER,
+                    num_f_evaluations INTEGER, num_jacobians INTEGER, num_crossing_evaluations INTEGER, success INTEGER);
+                CREATE INDEX IF NOT EXISTS runs_model ON runs (model_name, out_file_name);
+                CREATE INDEX IF NOT EXISTS params_name_value ON params (name, value);
+                CREATE INDEX IF NOT EXISTS params_name_text ON params (name, value_text);
+                CREATE INDEX IF NOT EXISTS params_run ON params (run_id);
+                CREATE INDEX IF NOT EXISTS variables_run ON variables (run_id, name);
+            """)
+
+    def _get_run_columns(self):
+        with self.lock:
+            return [row[1] for row in self.connection.execute("PRAGMA table_info(runs)").fetchall()]
+
+    @staticmethod
+    def _split_value(value):
+        """
+        Split value into numeric and text representation
+        @return: (numeric value or None, text value or None)
+        """
+        if isinstance(value, (bool, np.bool_)):
+            return float(value), None
+        try:
+            return float(value), None
+        except (TypeError, ValueError):
+            return None, json.dumps(value, default=str) if not isinstance(value, str) else value
+
+    @staticmethod
+    def _parse_value(text):
+        """
+        Restore numeric sweep values stored as text
+        """
+        try:
+            value = float(text)
+        except (TypeError, ValueError):
+            return text
+        return int(value) if value.is_integer() and "." not in str(text) else value
+
+    @staticmethod
+    def _compute_statistics(simulation_results: pd.DataFrame):
+        """
+        Compute statistics of all numeric columns - vectorized
+        @return: list of tuples (name, min, max, mean, std, final)
+        """
+        numeric_results = simulation_results.select_dtypes(include=[np.number])
+        if numeric_results.shape[0] == 0:
+            return []
+        values = numeric_results.to_numpy(dtype=np.float64)
+        statistics = np.stack([np.nanmin(values, axis=0), np.nanmax(values, axis=0), np.nanmean(values, axis=0),
+                               np.nanstd(values, axis=0), values[-1]], axis=-1)
+        return [(str(name),) + tuple(float(val) for val in row) for name, row in zip(numeric_results.columns, statistics)]
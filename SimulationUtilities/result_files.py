@@ -0,0 +1,184 @@
+import os
+
+import numpy as np
+
+from . import simulation_utils as simutils
+
+
+class DymolaResultFile:
+    """
+    Reader for Dymola result files (MAT v4 format) - works without a Dymola installation.
+    Only the matrix headers and the small matrices (names, dataInfo, parameters) are read on opening.
+    The trajectory matrix data_2 is memory-mapped, so trajectories, time ranges and final values
+    are read from disk on access only. The reader is thread-safe and can be used from worker processes.
+    """
+    # MAT v4 precision codes
+    mat_dtypes = {0: "f8", 1: "f4", 2: "i4", 3: "i2", 4: "u2", 5: "u1"}
+
+    def __init__(self, result_path: str):
+        self.result_path = result_path
+        self.matrices = self._read_headers(result_path)
+        aclass = self._read_text("Aclass")
+        self.transposed = len(aclass) > 3 and aclass[3] == "binTrans"
+        self.names = self._read_text("name")
+        self.name_index = {name: index for index, name in enumerate(self.names)}
+        self.data_info = self._read_matrix("dataInfo")
+        self.data_1 = self._read_matrix("data_1")
+        self.data_2 = self._read_matrix("data_2", mmap=True)
+
+    @property
+    def num_timesteps(self):
+        return self.data_2.shape[0]
+
+    def exist_trajectories(self, names: list):
+        """
+        Check if trajectories exist
+        @param names: trajectory names
+        @return: list of bool
+        """
+        return [name in self.name_index for name in names]
+
+    def get_trajectory(self, name: str, rows=slice(None)):
+        """
+        Get trajectory values
+        @param name: trajectory name
+        @param rows: selection of time steps - default: all
+        @return: np.ndarray
+        """
+        matrix, column = self.data_info[self.name_index[name], :2]
+        sign = -1.0 if column < 0 else 1.0
+        if matrix == 1:
+            # Parameters: constant value
+            return np.full(len(range(self.num_timesteps)[rows]), sign * self.data_1[0, abs(column) - 1])
+        return sign * np.asarray(self.data_2[rows, abs(column) - 1], dtype=np.float64)
+
+    def get_trajectories(self, names: list, rows=slice(None)):
+        """
+        Get multiple trajectories
+        @param names: trajectory names
+        @param rows: selection of time steps - default: all
+        @return: np.ndarray of shape (time, names)
+        """
+        return np.stack([self.get_trajectory(name, rows) for name in names], axis=-1)
+
+    def get_final_values(self, names=None):
+        """
+        Get values at the last time step - only the last row of data_2 is read.
+        @param names: trajectory names - default: all
+        @return: dict {name: value}
+        """
+        names = names if names is not None else self.names
+        return dict(zip(names, self.get_trajectories(names, rows=slice(-1, None))[0]))
+
+    def to_dataframe(self, trajectory_names: list, rows=slice(None)):
+        """
+        Read trajectories into dataframe - same format as DymolaSimulatorNative._get_simulation_results
+        @param trajectory_names: names of trajectories - non-existing trajectories are skipped
+        @param rows: selection of time steps - default: all
+        @return: pd.DataFrame with TimedeltaIndex
+        """
+        traj_names_full = ["Time"] + [name for name in trajectory_names if name in self.name_index]
+        trajectories = self.get_trajectories(traj_names_full, rows)
+        return simutils.create_df(list(trajectories.T), traj_names_full)
+
+    ######################################## Private methods ###########################################################
+
+    @classmethod
+    def _read_headers(cls, result_path):
+        """
+        Read all matrix headers
+        @return: dict {matrix name: (dtype, mrows, ncols, data offset)}
+        """
+        matrices = {}
+        file_size = os.path.getsize(result_path)
+        with open(result_path, "rb") as f:
+            offset = 0
+            while offset + 20 <= file_size:
+                f.seek(offset)
+                header = np.frombuffer(f.read(20), dtype="<i4")
+                if header[0] > 9999 or header[0] < 0:
+                    header = header.byteswap()
+                mat_type, mrows, ncols, imagf, namlen = (int(val) for val in header)
+                byte_order = ">" if mat_type // 1000 == 1 else "<"
+                dtype = np.dtype(byte_order + cls.mat_dtypes[(mat_type // 10) % 10])
+                name = f.read(namlen).rstrip(b"\x00").decode("latin-1")
+                data_offset = offset + 20 + namlen
+                matrices[name] = (dtype, mrows, ncols, data_offset)
+                offset = data_offset + mrows * ncols * dtype.itemsize * (2 if imagf else 1)
+        return matrices
+
+    def _read_matrix(self, name, mmap=False):
+        """
+        Read matrix - returns the logical (untransposed) matrix
+        """
+        if name not in self.matrices:
+            return np.zeros((0, 0))
+        dtype, mrows, ncols, data_offset = self.matrices[name]
+        if mmap:
+            data = np.memmap(self.result_path, dtype=dtype, mode="r", offset=data_offset, shape=(ncols, mrows))
+        else:
+            data = np.fromfile(self.result_path, dtype=dtype, count=mrows * ncols, offset=data_offset).reshape(ncols, mrows)
+        # Data is stored column-major: data has shape (ncols, mrows) = stored matrix transposed
+        transposed = getattr(self, "transposed", False) and name != "Aclass"
+        return data if transposed else data.T
+
+    def _read_text(self, name):
+        chars = self._read_matrix(name)
+        return ["".join(chr(c) for c in row).rstrip(" \x00") for row in chars.astype(np.uint8)]
+
+
+def read_trajectories(result_path: str, trajectory_names: list):
+    """
+    Read trajectories from Dymola result file without Dymola
+    @param result_path: Path to .mat file
+    @param trajectory_names: Names of trajectories
+    @return: pd.DataFrame with TimedeltaIndex
+    """
+    return DymolaResultFile(result_path).to_dataframe(trajectory_names)
+
+
+def write_mat_v4(path: str, matrices: dict):
+    """
+    Write matrices to a MAT v4 file (little endian) - readable by Dymola, e.g. CombiTimeTable or importInitialResult
+    @param path: path to .mat file
+    @param matrices: dict {name: matrix} - numeric matrices are stored as double (float32/int32/uint8 arrays keep their type),
+    lists of strings are stored as text matrices (one string per row)
+    """
+    with open(path, "wb") as f:
+        for name, matrix in matrices.items():
+            text = isinstance(matrix, (list, tuple)) and len(matrix) > 0 and isinstance(matrix[0], str)
+            if text:
+                width = max(len(row) for row in matrix)
+                matrix = np.array([[ord(char) for char in row.ljust(width)] for row in matrix], dtype=np.uint8)
+            matrix = np.asarray(matrix)
+            matrix = matrix.reshape(-1, 1) if matrix.ndim == 1 else matrix
+            precision = {np.dtype("f4"): 1, np.dtype("i4"): 2, np.dtype("u1"): 5}.get(matrix.dtype, 0)
+            if precision == 0:
+                matrix = matrix.astype("<f8")
+            encoded_name = name.encode("latin-1") + b"\x00"
+            mat_type = precision * 10 + (1 if text else 0)
+            f.write(np.array([mat_type, matrix.shape[0], matrix.shape[1], 0, len(encoded_name)], dtype="<i4").tobytes())
+            f.write(encoded_name)
+            # Column-major order
+            f.write(np.asfortranarray(matrix.astype(matrix.dtype.newbyteorder("<"))).tobytes(order="F"))
+
+
+
+def write_initial_state(path: str, state: dict, time=0.0):
+    """
+    Write a state as a tiny Dymola result file with a single time point - for importInitialResult
+    @param path: path to .mat file
+    @param state: dict {name: value}
+    @param time: time of state
+    """
+    names = list(state.keys())
+    values = [float(time)] + [float(value) for value in state.values()]
+    # Time is the abscissa, all variables are stored in data_2
+    data_info = np.array([[0, 1, 0, -1]] + [[2, index + 2, 0, -1] for index in range(len(names))], dtype=np.int32)
+    write_mat_v4(path, {"Aclass": ["Atrajectory", "1.1", "", "binNormal"],
+                        "name": ["Time"] + names,
+                        "description": ["Time in [s]"] + ["" for _ in names],
+                        "dataInfo": data_info,
+                        "data_1": np.array([[float(time)], [float(time)]]),
+                        # Two identical rows - interpolation at the start time returns the state
+                        "data_2": np.array([values, values])})
@@ -0,0 +1,352 @@
+import collections
+import copy
+import itertools
+import secrets
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+import pandas as pd
+
+from .Parameters import SimulationParameters, InitializationParameters
+
+
+class FairQueue:
+    """
+    Request queue with round-robin scheduling over clients - a client with many requests cannot starve the others.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.queues = collections.OrderedDict()
+        self.closed = False
+
+    def put(self, client_id, item):
+        with self.condition:
+            self.queues.setdefault(client_id, collections.deque()).append(item)
+            self.condition.notify()
+
+    def get(self):
+        """
+        Get next request - clients take turns
+        @return: item or None if the queue was closed
+        """
+        with self.condition:
+            while not self.closed and not self.queues:
+                self.condition.wait()
+            if self.closed:
+                return None
+            client_id, requests = next(iter(self.queues.items()))
+            item = requests.popleft()
+            # Move client to the end of the round
+            del self.queues[client_id]
+            if requests:
+                self.queues[client_id] = requests
+            return item
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class SimulationServer:
+    """
+    Long-lived local simulation server.
+    Keeps simulators warm (open Dymola sessions, extracted and instantiated FMUs, loaded packages) and serves requests
+    of many clients over an authenticated local socket (multiprocessing.connection).
+    Each simulator name has a pool of simulator instances - one worker thread per instance.
+    Requests are scheduled round-robin over clients. Simulation and initialization parameters are sent with each request,
+    so clients do not interfere through shared simulator state. Methods that change persistent simulator state
+    (e.g. setup_experiment, set_input_table) are not served.
+    Result dataframes are streamed back column by column as raw binary buffers.
+    Requests are pickled - the authentication key is the only protection against arbitrary code execution, so there is
+    no default key.
+    Parameters:
+        - simulators: dict {name: simulator or list of simulators}
+        - address: (host, port) - default: localhost
+        - authkey: authentication key (bytes) - shared with the clients. None: random key (see authkey attribute)
+    Additional Methods:
+    - start
+    - serve_forever
+    - shutdown
+    """
+    # Methods clients may call on the simulators
+    allowed_methods = {"run_simulation", "run_simulation_sweep", "run_experiment", "model_name_full",
+                       "run_simulation_sweep_continuation"}
+
+    def __init__(self, simulators: dict, address=("localhost", 6000), authkey=None):
+        self.simulators = {name: sims if isinstance(sims, (list, tuple)) else [sims] for name, sims in simulators.items()}
+        self.address = address
+        self.authkey = authkey if authkey is not None else secrets.token_bytes(32)
+        self.queues = {name: FairQueue() for name in self.simulators.keys()}
+        self.listener = None
+        self.running = False
+        self.threads = []
+        self.client_ids = itertools.count()
+
+    def start(self):
+        """
+        Start server in background threads
+        @return: address of server
+        """
+        self.listener = Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.running = True
+        for name, simulators in self.simulators.items():
+            for simulator in simulators:
+                self._start_thread(self._work, name, simulator)
+        self._start_thread(self._accept)
+        return self.address
+
+    def serve_forever(self):
+        """
+        Start server and block until shutdown
+        """
+        if not self.running:
+            self.start()
+        for thread in list(self.threads):
+            thread.join()
+
+    def shutdown(self):
+        self.running = False
+        for fair_queue in self.queues.values():
+            fair_queue.close()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+
+    ######################################## Private methods ###########################################################
+
+    def _start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _accept(self):
+        while self.running:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, AttributeError, AuthenticationError):
+                # Listener closed or client failed authentication
+                if not self.running:
+                    break
+                continue
+            self._start_thread(self._serve_client, connection, next(self.client_ids))
+
+    def _serve_client(self, connection, client_id):
+        """
+        Receive requests of one client and forward them to the queue of the requested simulator
+        """
+        send_lock = threading.Lock()
+        with connection:
+            while self.running:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    break
+                if request.get("method") in ("list_simulators", "get_params"):
+                    with send_lock:
+                        connection.send({"status": "ok", "result": self._get_server_info(request)})
+                    continue
+                if request.get("simulator") not in self.queues or request.get("method") not in self.allowed_methods:
+                    with send_lock:
+                        connection.send({"status": "error", "message": f"Invalid request: {request.get('simulator')}.{request.get('method')}"})
+                    continue
+                done = threading.Event()
+                self.queues[request["simulator"]].put(client_id, (request, connection, send_lock, done))
+                # Requests of a client are processed in order
+                done.wait()
+
+    def _get_server_info(self, request):
+        if request["method"] == "list_simulators":
+            return {name: len(simulators) for name, simulators in self.simulators.items()}
+        if request.get("simulator") not in self.simulators:
+            return None
+        # Parameters of the simulator as configured on the server - starting point of the client
+        simulator = self.simulators[request["simulator"]][0]
+        return copy.deepcopy(simulator.sim_params), copy.deepcopy(simulator.init_params)
+
+    def _work(self, name, simulator):
+        """
+        Worker of one simulator instance
+        """
+        while self.running:
+            item = self.queues[name].get()
+            if item is None:
+                break
+            request, connection, send_lock, done = item
+            try:
+                if request.get("sim_params") is not None:
+                    simulator.set_sim_params(request["sim_params"])
+                if request.get("init_params") is not None:
+                    simulator.init_params = request["init_params"]
+                result = getattr(simulator, request["method"])(*request.get("args", ()), **request.get("kwargs", {}))
+                reply = {"status": "ok"}
+            except Exception as ex:
+                result = None
+                reply = {"status": "error", "message": f"{type(ex).__name__}: {ex}"}
+            try:
+                with send_lock:
+                    if reply["status"] == "ok":
+                        send_result(connection, result)
+                    else:
+                        connection.send(reply)
+            except (EOFError, OSError):
+                # Client disconnected
+                pass
+            finally:
+                done.set()
+
+
+class SimulationClient:
+    """
+    Thin client of a SimulationServer - mirrors the methods of ModelicaSimulator.
+    Simulation and initialization parameters are kept on the client and sent with each request.
+    Parameters:
+        - address: (host, port) of server
+        - authkey: authentication key of the server (SimulationServer.authkey)
+        - simulator: name of simulator on the server
+    """
+    sim_params: SimulationParameters = None
+    init_params: InitializationParameters = None
+
+    def __init__(self, address, authkey: bytes, simulator=""):
+        if not authkey:
+            raise Exception("An authentication key is required.")
+        self.address = address
+        self.simulator = simulator
+        self.connection = Client(address, authkey=authkey)
+        self.connection.send({"simulator": simulator, "method": "get_params"})
+        params = receive_result(self.connection)
+        if params is None:
+            self.close()
+            raise Exception(f"Simulator {simulator} not available on server.")
+        self.sim_params, self.init_params = params
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def list_simulators(self):
+        """
+        @return: dict {simulator name: number of instances}
+        """
+        self.connection.send({"method": "list_simulators"})
+        return receive_result(self.connection)
+
+    def run_simulation(self, trajectory_names: list, store_csv=False, **kwargs):
+        return self.call("run_simulation", trajectory_names, store_csv=store_csv, **kwargs)
+
+    def run_simulation_sweep(self, trajectory_names: list, sweep_var: str, sweep_values: list, store_csv=False, **kwargs):
+        return self.call("run_simulation_sweep", trajectory_names, sweep_var, sweep_values, store_csv=store_csv, **kwargs)
+
+    def run_experiment(self, exp_name="", trajectory_names=[], start_time=None, stop_time=None, plot_enabled=False, **kwargs):
+        # Start and stop time are applied on the client - the request carries the resulting parameters
+        self.set_start_time(start_time)
+        self.set_stop_time(stop_time)
+        return self.call("run_experiment", exp_name, trajectory_names, plot_enabled=plot_enabled, **kwargs)
+
+    def model_name_full(self):
+        return self.call("model_name_full")
+
+    def call(self, method: str, *args, **kwargs):
+        """
+        Call method of the remote simulator
+        @return: result - dataframes are received as binary columns
+        """
+        self.connection.send({"simulator": self.simulator, "method": method, "args": args, "kwargs": kwargs,
+                              "sim_params": self.sim_params, "init_params": self.init_params})
+        return receive_result(self.connection)
+
+    ##################### Parameters - kept on the client ##############################################################
+
+    def set_sim_params(self, sim_params: SimulationParameters):
+        self.sim_params = copy.deepcopy(sim_params)
+
+    def set_start_time(self, start_time=None):
+        self.sim_params.set_start_time(start_time)
+
+    def set_stop_time(self, stop_time=None):
+        self.sim_params.set_stop_time(stop_time)
+
+    def get_start_time(self):
+        return self.sim_params.get_start_time()
+
+    def get_stop_time(self):
+        return self.sim_params.get_stop_time()
+
+    def set_init_params_full(self, init_file: str, init_variables: dict):
+        self.init_params.set_initialization_parameters_full(init_file, init_variables)
+
+    def set_init_variables(self, init_variables: dict):
+        self.init_params.set_init_variables(init_variables)
+
+    def use_init_file(self, use_init_file=True):
+        self.init_params.set_use_init_file(use_init_file)
+
+    def use_init_vals(self, use_init_vals=True):
+        self.init_params.set_use_init_values(use_init_vals)
+
+    def set_init_file(self, init_file: str):
+        self.init_params.set_init_filename(init_file)
+
+
+######################################## Binary result transfer ########################################################
+
+def send_result(connection, result):
+    """
+    Send result - dataframes (also in lists) are sent as header + one raw buffer per column and the index
+    """
+    if isinstance(result, pd.DataFrame):
+        connection.send({"status": "ok", "type": "dataframe"})
+        send_dataframe(connection, result)
+    elif isinstance(result, list) and result and all(isinstance(item, pd.DataFrame) or item is None for item in result):
+        connection.send({"status": "ok", "type": "dataframe_list", "length": len(result)})
+        for item in result:
+            connection.send(item is not None)
+            if item is not None:
+                send_dataframe(connection, item)
+    else:
+        connection.send({"status": "ok", "type": "object", "result": result})
+
+
+def receive_result(connection):
+    header = connection.recv()
+    if header["status"] == "error":
+        raise Exception(f"Simulation server: {header['message']}")
+    if header.get("type") == "dataframe":
+        return receive_dataframe(connection)
+    if header.get("type") == "dataframe_list":
+        return [receive_dataframe(connection) if connection.recv() else None for _ in range(header["length"])]
+    return header.get("result")
+
+
+def send_dataframe(connection, df: pd.DataFrame):
+    is_timedelta = isinstance(df.index, pd.TimedeltaIndex)
+    index = df.index.asi8 if is_timedelta else np.asarray(df.index)
+    columns = [np.ascontiguousarray(df[name].to_numpy()) for name in df.columns]
+    binary = [column.dtype.kind in "biuf" for column in columns]
+    connection.send({"columns": list(df.columns), "index_dtype": index.dtype.str, "timedelta_index": is_timedelta,
+                     "dtypes": [column.dtype.str if is_binary else None for column, is_binary in zip(columns, binary)]})
+    connection.send_bytes(np.ascontiguousarray(index))
+    for column, is_binary in zip(columns, binary):
+        if is_binary:
+            connection.send_bytes(column)
+        else:
+            connection.send(column)
+
+
+def receive_dataframe(connection):
+    header = connection.recv()
+    index = np.frombuffer(connection.recv_bytes(), dtype=header["index_dtype"])
+    data = {}
+    for name, dtype in zip(header["columns"], header["dtypes"]):
+        data[name] = np.frombuffer(connection.recv_bytes(), dtype=dtype) if dtype is not None else connection.recv()
+    index = pd.TimedeltaIndex(index.view("timedelta64[ns]")) if header["timedelta_index"] else index
+    return pd.DataFrame(data, index=index, columns=header["columns"])
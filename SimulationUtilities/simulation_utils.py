@@ -1,3 +1,4 @@
+import json
 import os
 from typing import List
 
@@ -18,6 +19,70 @@ def create_df(trajectories, labels):
     """
     return pd.DataFrame(data=np.array(trajectories[1:]).T, columns=labels[1:], index=pd.TimedeltaIndex(trajectories[0], unit='s'))
 
+
+def read_result_csv(result_path, **kwargs):
+    """
+    Read results stored by ModelicaSimulator.run_simulation
+    @param result_path: path to csv file
+    Optional arguments: passed to pd.read_csv, e.g. nrows, usecols
+    @return dataframe - time deltas are restored as TimedeltaIndex
+    """
+    results = pd.read_csv(result_path, sep=";", index_col=0, **kwargs)
+    results.index.name = None
+    if results.index.dtype == object and len(results.index) > 0:
+        try:
+            results.index = pd.TimedeltaIndex(pd.to_timedelta(results.index))
+        except ValueError:
+            pass
+    return results
+
+
+def read_memmap_result(result_path, mode="r"):
+    """
+    Read results stored as .npy file with column names in a .json sidecar - e.g. by FMPYSimulator with memmap_output.
+    The data is not loaded - the returned dataframe is a view on the memory-mapped file.
+    @param result_path: path to .npy file
+    @param mode: memmap mode - "r" or "r+"
+    @return dataframe indexed by time in s
+    """
+    with open(f"{os.path.splitext(result_path)[0]}.json", "r") as f:
+        names = json.load(f)["names"]
+    data = np.load(result_path, mmap_mode=mode)
+    return pd.DataFrame(data[:, 1:], index=pd.Index(data[:, 0], name=None), columns=names[1:], copy=False)
+
+
+def time_index_to_seconds(index):
+    """
+    Convert time index of results to seconds
+    @param index: TimedeltaIndex or numeric index
+    @return np.ndarray of float
+    """
+    return index.total_seconds().to_numpy() if isinstance(index, pd.TimedeltaIndex) else np.asarray(index, dtype=np.float64)
+
+def compute_error_metrics(reference: pd.DataFrame, results: pd.DataFrame, trajectory_names=None):
+    """
+    Compare results against a reference - vectorized over all time steps and variables.
+    Results are interpolated onto the time grid of the reference.
+    @param reference: reference results
+    @param results: results to compare
+    @param trajectory_names: names of compared trajectories - default: all columns of the reference
+    @return dataframe with one row per variable: max_abs_error, rmse, nrmse (rmse normalized by range of reference)
+    """
+    trajectory_names = list(trajectory_names) if trajectory_names is not None else list(reference.columns)
+    reference_time = time_index_to_seconds(reference.index)
+    results_time = time_index_to_seconds(results.index)
+    reference_values = reference[trajectory_names].to_numpy(dtype=np.float64)
+    results_values = results[trajectory_names].to_numpy(dtype=np.float64)
+    if results_values.shape != reference_values.shape or not np.array_equal(reference_time, results_time):
+        results_values = np.stack([np.interp(reference_time, results_time, results_values[:, i])
+                                   for i in range(len(trajectory_names))], axis=-1)
+    errors = results_values - reference_values
+    rmse = np.sqrt(np.mean(errors ** 2, axis=0))
+    value_range = np.ptp(reference_values, axis=0)
+    nrmse = rmse / np.where(value_range > 0, value_range, 1.0)
+    return pd.DataFrame({"max_abs_error": np.max(np.abs(errors), axis=0), "rmse": rmse, "nrmse": nrmse},
+                        index=trajectory_names)
+
 ######################################### Plotting ####################################################################
 
 def plot_multiple_results(list_simulation_results: List[pd.DataFrame], plot_path, output_file_name, **kwargs):
@@ -129,14 +194,18 @@ def create_time_axis_days(index, divider=3600 * 24):
     return [val.total_seconds() / divider for val in index]
 
 
-def create_input_array(input_parameters={}, num_intervals=1):
+def create_input_array(input_parameters={}, num_intervals=1, time=None):
     """
-    Create simulation input array with constant values
+    Create simulation input array with constant values - one row per timestep
     @param input_parmaeters: dictionary - {input feature name: value}
     @parm num_intervals: Number of simulation timesteps
+    @param time: time vector - optional. If given, a field "time" is added as first field (fmpy input format)
     """
-    input_data = np.ndarray(shape=((len(input_parameters), num_intervals)),
-                            dtype=np.dtype([(name, np.float32) for name in input_parameters.keys()]))
+    fields = [("time", np.float64)] if time is not None else []
+    input_data = np.zeros(shape=(num_intervals if time is None else len(time),),
+                          dtype=np.dtype(fields + [(name, np.float64) for name in input_parameters.keys()]))
+    if time is not None:
+        input_data["time"] = time
     for name, val in input_parameters.items():
         input_data[name] = val
 
@@ -0,0 +1,138 @@
+import dataclasses
+import os
+import re
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .result_files import DymolaResultFile
+
+
+@dataclass
+class SolverStatistics:
+    """
+    Solver statistics of a run - fields that a simulator does not provide stay None.
+    - wall_time: wall time of simulation in s
+    - cpu_time: CPU time of integration in s
+    - init_time: CPU time of initialization in s
+    - num_steps: number of accepted steps (FMU: communication steps)
+    - num_rejected_steps: number of rejected steps
+    - num_state_events, num_time_events, num_step_events: number of events
+    - num_f_evaluations: number of evaluations of the dynamics
+    - num_jacobians: number of Jacobian evaluations
+    - num_crossing_evaluations: number of crossing function evaluations
+    - success: integration terminated successfully
+    """
+    wall_time: float = None
+    cpu_time: float = None
+    init_time: float = None
+    num_steps: int = None
+    num_rejected_steps: int = None
+    num_state_events: int = None
+    num_time_events: int = None
+    num_step_events: int = None
+    num_f_evaluations: int = None
+    num_jacobians: int = None
+    num_crossing_evaluations: int = None
+    success: bool = None
+
+    def to_dict(self):
+        return dataclasses.asdict(self)
+
+
+# dslog.txt entries - "   Number of accepted steps                  : 1234"
+DSLOG_FIELDS = {"CPU-time for integration": "cpu_time",
+                "CPU-time for initialization": "init_time",
+                "Number of accepted steps": "num_steps",
+                "Number of rejected steps": "num_rejected_steps",
+                "Number of state events": "num_state_events",
+                "Number of step events": "num_step_events",
+                "Number of f-evaluations (dynamics)": "num_f_evaluations",
+                "Number of Jacobian-evaluations": "num_jacobians",
+                "Number of crossing function evaluations": "num_crossing_evaluations"}
+DSLOG_TIME_EVENT_FIELDS = ["Number of model time events", "Number of input time events"]
+DSLOG_LINE = re.compile(r"^\s*(.+?)\s*:\s*([-+]?[0-9.]+(?:[eE][-+]?[0-9]+)?)")
+
+
+def parse_dslog(dslog_path: str, statistics: SolverStatistics = None):
+    """
+    Parse solver statistics from Dymola log (dslog.txt)
+    @param dslog_path: path to dslog.txt
+    @param statistics: statistics to update - optional
+    @return: SolverStatistics
+    """
+    statistics = statistics if statistics is not None else SolverStatistics()
+    time_events = None
+    with open(dslog_path, "r", errors="replace") as f:
+        for line in f:
+            if "Integration terminated successfully" in line:
+                statistics.success = True
+            elif "Integration terminated before reaching" in line or "Simulation failed" in line:
+                statistics.success = False
+            match = DSLOG_LINE.match(line)
+            if match is None:
+                continue
+            key, value = match.group(1), float(match.group(2))
+            if key in DSLOG_FIELDS:
+                field_name = DSLOG_FIELDS[key]
+                setattr(statistics, field_name, value if field_name.endswith("time") else int(value))
+            elif key in DSLOG_TIME_EVENT_FIELDS:
+                time_events = (time_events or 0) + int(value)
+    if time_events is not None:
+        statistics.num_time_events = time_events
+    return statistics
+
+
+def read_result_statistics(result_path: str, statistics: SolverStatistics = None):
+    """
+    Read statistics stored in the Dymola result file - CPUtime and EventCounter (if stored)
+    @param result_path: path to result file (.mat)
+    @param statistics: statistics to update - optional
+    @return: SolverStatistics
+    """
+    statistics = statistics if statistics is not None else SolverStatistics()
+    result_file = DymolaResultFile(result_path)
+    names = [name for name, exists in zip(["CPUtime", "EventCounter"], result_file.exist_trajectories(["CPUtime", "EventCounter"])) if exists]
+    if names:
+        final_values = result_file.get_final_values(names)
+        if "CPUtime" in final_values and statistics.cpu_time is None:
+            statistics.cpu_time = float(final_values["CPUtime"])
+        if "EventCounter" in final_values and statistics.num_state_events is None:
+            statistics.num_state_events = int(final_values["EventCounter"])
+    return statistics
+
+
+def read_dymola_statistics(dslog_path=None, result_path=None, wall_time=None):
+    """
+    Collect statistics of a Dymola run from dslog.txt and the result file - missing files are skipped
+    @return: SolverStatistics
+    """
+    statistics = SolverStatistics(wall_time=wall_time)
+    if dslog_path and os.path.isfile(dslog_path):
+        parse_dslog(dslog_path, statistics)
+    if result_path and os.path.isfile(result_path):
+        read_result_statistics(result_path, statistics)
+    return statistics
+
+
+def rank_statistics(points: list, statistics_list: list, by="cpu_time", ascending=False):
+    """
+    Rank runs by cost - e.g. to find pathological sweep points
+    @param points: list of point descriptions, e.g. sweep values or dicts of parameters
+    @param statistics_list: list of SolverStatistics
+    @param by: ranking criterion - field of SolverStatistics. Falls back to wall_time if not available.
+    @param ascending: sort order - default: most expensive first
+    @return: dataframe - one row per run, ranked
+    """
+    rows = []
+    for point, statistics in zip(points, statistics_list):
+        row = dict(point) if isinstance(point, dict) else {"point": point}
+        # Runs without statistics (e.g. reused results) get empty fields
+        row.update((statistics if statistics is not None else SolverStatistics()).to_dict())
+        rows.append(row)
+    report = pd.DataFrame(rows)
+    if by not in report.columns or report[by].isna().all():
+        by = "wall_time"
+    if by in report.columns:
+        report = report.sort_values(by, ascending=ascending, na_position="last")
+    return report.reset_index(drop=True)
@@ -0,0 +1,123 @@
+import dataclasses
+import itertools
+import time
+
+import pandas as pd
+
+from . import simulation_utils as simutils
+from .Parameters import SimulationParameters
+
+
+class SolverTuner:
+    """
+    Solver and tolerance tuning.
+    Runs the model of a simulator over a grid of algorithm / tolerance / fixed_stepsize settings and compares
+    the trajectories of each run against a reference run with tight tolerance.
+    The fastest configuration within the accuracy bound is selected and can be saved as SimulationParameters.
+    Parameters:
+        - simulator: ModelicaSimulator - start/stop time and output grid are taken from its simulation parameters
+        - trajectory_names: names of compared trajectories
+        - algorithms: list of solver names, e.g. ["Dassl", "Cvode", "Radau", "Euler"]
+        - tolerances: list of tolerances
+        - fixed_stepsizes: list of fixed step sizes - only relevant for fixed step solvers
+        - reference_algorithm: solver of the reference run - default: current algorithm of the simulator
+        - reference_tolerance: tolerance of the reference run
+        - error_metric: metric used for the accuracy bound - "max_abs_error", "rmse" or "nrmse"
+        - repetitions: number of timed runs per configuration - the minimum duration is used
+    """
+    error_metric = "nrmse"
+    repetitions = 1
+
+    def __init__(self, simulator, trajectory_names: list, algorithms=None, tolerances=None, fixed_stepsizes=None,
+                 reference_algorithm=None, reference_tolerance=1e-8, error_metric="nrmse", repetitions=1):
+        self.simulator = simulator
+        self.trajectory_names = trajectory_names
+        self.algorithms = algorithms if algorithms else [simulator.sim_params.algorithm]
+        self.tolerances = tolerances if tolerances else [simulator.sim_params.tolerance]
+        self.fixed_stepsizes = fixed_stepsizes if fixed_stepsizes else [simulator.sim_params.fixed_stepsize]
+        self.reference_algorithm = reference_algorithm if reference_algorithm else simulator.sim_params.algorithm
+        self.reference_tolerance = reference_tolerance
+        self.error_metric = error_metric
+        self.repetitions = repetitions
+        self.reference_results_ = None
+        self.report_ = None
+        self.best_params_ = None
+
+    def run(self, accuracy_bound: float, **kwargs):
+        """
+        Run tuning benchmark
+        @param accuracy_bound: maximum error (error_metric, worst variable) of an accepted configuration
+        Optional arguments: passed to run_simulation, e.g. additional_params
+        @return: report - dataframe with one row per configuration, sorted by duration
+        """
+        base_params = self.simulator.sim_params
+        try:
+            reference_params = dataclasses.replace(base_params, algorithm=self.reference_algorithm,
+                                                   tolerance=self.reference_tolerance)
+            self.reference_results_, _ = self._run_configuration(reference_params, "tuning_reference", **kwargs)
+            if self.reference_results_ is None:
+                raise Exception("Reference simulation failed.")
+            rows = []
+            for index, (algorithm, tolerance, fixed_stepsize) in enumerate(
+                    itertools.product(self.algorithms, self.tolerances, self.fixed_stepsizes)):
+                sim_params = dataclasses.replace(base_params, algorithm=algorithm, tolerance=tolerance,
+                                                 fixed_stepsize=fixed_stepsize)
+                results, duration = self._run_configuration(sim_params, f"tuning_{index}", **kwargs)
+                row = {"algorithm": algorithm, "tolerance": tolerance, "fixed_stepsize": fixed_stepsize,
+                       "duration": duration, "success": results is not None}
+                if results is not None:
+                    # Worst variable per metric
+                    row.update(simutils.compute_error_metrics(self.reference_results_, results, self.trajectory_names).max())
+                rows.append(row)
+        finally:
+            self.simulator.set_sim_params(base_params)
+
+        self.report_ = pd.DataFrame(rows).sort_values("duration").reset_index(drop=True)
+        accepted = self.report_[self.report_["success"] & (self.report_.get(self.error_metric, float("inf")) <= accuracy_bound)]
+        self.report_["accepted"] = self.report_.index.isin(accepted.index)
+        if accepted.empty:
+            print("No configuration within accuracy bound.")
+            self.best_params_ = None
+        else:
+            best = accepted.iloc[0]
+            self.best_params_ = dataclasses.replace(base_params, algorithm=best["algorithm"], tolerance=float(best["tolerance"]),
+                                                    fixed_stepsize=float(best["fixed_stepsize"]))
+        return self.report_
+
+    def save_best_params(self, file_path="tuned_simulation_params.json"):
+        """
+        Save fastest accepted configuration as SimulationParameters json
+        @param file_path: path of json file
+        @return: SimulationParameters
+        """
+        if self.best_params_ is None:
+            raise Exception("No tuned parameters - run tuning first.")
+        self.best_params_.to_file(file_path)
+        return self.best_params_
+
+    ######################################## Private methods ###########################################################
+
+    def _run_configuration(self, sim_params: SimulationParameters, out_file_name, **kwargs):
+        """
+        Run simulation with given parameters
+        @return: results (None if simulation failed), minimum duration of repetitions
+        """
+        self.simulator.set_sim_params(sim_params)
+        results = None
+        durations = []
+        # Timed runs must simulate - stored results are not reused
+        dependency_tracker, self.simulator.dependency_tracker = self.simulator.dependency_tracker, None
+        try:
+            for _ in range(self.repetitions):
+                start = time.perf_counter()
+                try:
+                    results = self.simulator.run_simulation(self.trajectory_names, out_file_name=out_file_name, **kwargs)
+                except Exception as ex:
+                    print(f"Simulation failed for {sim_params}: {ex}")
+                    return None, float("nan")
+                durations.append(time.perf_counter() - start)
+                if results is None:
+                    return None, float("nan")
+        finally:
+            self.simulator.dependency_tracker = dependency_tracker
+        return results, min(durations)
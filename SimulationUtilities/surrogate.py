@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+from . import simulation_utils as simutils
+
+
+class RBFSurrogate:
+    """
+    Cubic radial basis function surrogate with linear polynomial tail and leave-one-out error estimation.
+    Maps parameter vectors (n x d) to output vectors (n x m). Outputs can be scalar KPIs or flattened trajectories.
+    The inverse of the augmented kernel matrix is kept, so new samples are added with an O(n^2) bordered update.
+    Parameters:
+        - smoothing: ridge regularization - 0 for interpolation, > 0 for regression
+    """
+    smoothing = 0.0
+
+    def __init__(self, smoothing=0.0):
+        self.smoothing = smoothing
+        self.x_ = None
+        self.y_ = None
+        self.system_inv_ = None
+        self.coefficients_ = None
+
+    @property
+    def num_samples(self):
+        return 0 if self.x_ is None else self.x_.shape[0]
+
+    @property
+    def num_poly_terms(self):
+        return self.x_.shape[1] + 1
+
+    def fit(self, x, y):
+        """
+        Fit surrogate
+        @param x: parameters - shape (n, d)
+        @param y: outputs - shape (n, m)
+        """
+        self.x_ = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        self.y_ = np.asarray(y, dtype=np.float64).reshape(self.x_.shape[0], -1)
+        poly = self._poly(self.x_)
+        system = np.block([[np.zeros((self.num_poly_terms, self.num_poly_terms)), poly.T],
+                           [poly, self._kernel(self.x_, self.x_) + self.smoothing * np.eye(self.num_samples)]])
+        self.system_inv_ = np.linalg.pinv(system)
+        self._update_coefficients()
+        return self
+
+    def add_sample(self, x, y):
+        """
+        Add sample and refit incrementally (bordered matrix inverse)
+        @param x: parameters - shape (d,)
+        @param y: outputs - shape (m,)
+        """
+        x = np.asarray(x, dtype=np.float64).reshape(1, -1)
+        y = np.asarray(y, dtype=np.float64).reshape(1, -1)
+        if self.x_ is None or self.num_samples <= self.x_.shape[1] + 1:
+            # Not enough samples for a regular system yet - full fit
+            return self.fit(x if self.x_ is None else np.vstack([self.x_, x]), y if self.y_ is None else np.vstack([self.y_, y]))
+        border = np.concatenate([self._poly(x)[0], self._kernel(self.x_, x)[:, 0]])
+        system_inv_border = self.system_inv_ @ border
+        schur = self.smoothing - border @ system_inv_border
+        if abs(schur) < 1e-12:
+            return self.fit(np.vstack([self.x_, x]), np.vstack([self.y_, y]))
+        size = self.system_inv_.shape[0]
+        system_inv = np.empty((size + 1, size + 1))
+        system_inv[:-1, :-1] = self.system_inv_ + np.outer(system_inv_border, system_inv_border) / schur
+        system_inv[:-1, -1] = -system_inv_border / schur
+        system_inv[-1, :-1] = -system_inv_border / schur
+        system_inv[-1, -1] = 1.0 / schur
+        self.system_inv_ = system_inv
+        self.x_ = np.vstack([self.x_, x])
+        self.y_ = np.vstack([self.y_, y])
+        self._update_coefficients()
+        return self
+
+    def predict(self, x):
+        """
+        Evaluate surrogate
+        @param x: parameters - shape (q, d)
+        @return: outputs - shape (q, m)
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        return self._poly(x) @ self.coefficients_[:self.num_poly_terms] + self._kernel(x, self.x_) @ self.coefficients_[self.num_poly_terms:]
+
+    def loo_errors(self):
+        """
+        Leave-one-out errors of all samples (Rippa's formula) - no refits necessary
+        @return: absolute errors - shape (n, m)
+        """
+        diag = np.diag(self.system_inv_)[self.num_poly_terms:]
+        return np.abs(self.coefficients_[self.num_poly_terms:] / diag[:, None])
+
+    def estimate_error(self, x, num_neighbours=3):
+        """
+        Estimate prediction error at x: maximum leave-one-out error of the nearest samples,
+        scaled up if x is further away from the samples than their typical spacing.
+        @param x: parameters - shape (d,)
+        @param num_neighbours: number of nearest samples to consider
+        @return: estimated absolute error - shape (m,)
+        """
+        distances = np.linalg.norm(self.x_ - np.asarray(x, dtype=np.float64).reshape(1, -1), axis=1)
+        neighbours = np.argsort(distances)[:num_neighbours]
+        spacing = max(np.median(self._nearest_neighbour_distances(self.x_)), 1e-12)
+        return self.loo_errors()[neighbours].max(axis=0) * max(1.0, distances[neighbours[0]] / spacing)
+
+    ################################### Private methods ################################################################
+
+    def _update_coefficients(self):
+        self.coefficients_ = self.system_inv_ @ np.vstack([np.zeros((self.num_poly_terms, self.y_.shape[1])), self.y_])
+
+    @staticmethod
+    def _poly(x):
+        return np.hstack([np.ones((x.shape[0], 1)), x])
+
+    @staticmethod
+    def _kernel(x_1, x_2):
+        return np.linalg.norm(x_1[:, None, :] - x_2[None, :, :], axis=-1) ** 3
+
+    @staticmethod
+    def _nearest_neighbour_distances(x):
+        if x.shape[0] < 2:
+            return np.ones(1)
+        distances = np.linalg.norm(x[:, None, :] - x[None, :, :], axis=-1)
+        np.fill_diagonal(distances, np.inf)
+        return distances.min(axis=1)
+
+
+class SurrogateCache:
+    """
+    Response-surface cache for parameter queries.
+    Stored simulation results are used to fit a surrogate on scalar KPIs and on trajectories (interpolated on a common time grid).
+    Queries within the declared error bound are answered by the surrogate, otherwise the simulator is run
+    and the surrogate is refitted incrementally.
+    Parameters:
+        - simulator: ModelicaSimulator used for fallback simulations
+        - trajectory_names: names of trajectories
+        - param_names: names of parameters spanning the surrogate input space
+        - kpis: dictionary {kpi name: function(dataframe) -> float}
+        - error_bound: maximum accepted estimated absolute error of KPIs and trajectories
+        - param_scales: dictionary {param name: scale} - parameters are divided by their scale
+    """
+    error_bound = 1e-2
+    min_samples = 3
+
+    def __init__(self, simulator, trajectory_names: list, param_names: list, kpis=None, error_bound=1e-2,
+                 param_scales=None, smoothing=0.0):
+        self.simulator = simulator
+        self.trajectory_names = trajectory_names
+        self.param_names = param_names
+        self.kpis = kpis if kpis else {}
+        self.error_bound = error_bound
+        self.param_scales = np.array([(param_scales or {}).get(name, 1.0) for name in param_names], dtype=np.float64)
+        self.surrogate = RBFSurrogate(smoothing=smoothing)
+        self.time_ = None
+        self.num_queries = 0
+        self.num_simulations = 0
+
+    def add_result(self, params: dict, simulation_results: pd.DataFrame):
+        """
+        Add simulation result to the surrogate
+        @param params: dictionary {param name: value}
+        @param simulation_results: dataframe containing the trajectories
+        """
+        time = simutils.time_index_to_seconds(simulation_results.index)
+        if self.time_ is None:
+            self.time_ = time
+        trajectories = np.concatenate([np.interp(self.time_, time, simulation_results[name].to_numpy(dtype=np.float64))
+                                       for name in self.trajectory_names])
+        kpi_values = np.array([func(simulation_results) for func in self.kpis.values()], dtype=np.float64)
+        self.surrogate.add_sample(self._param_vector(params), np.concatenate([kpi_values, trajectories]))
+
+    def add_sweep_results(self, sweep_var: str, sweep_values: list, sweep_results: list, **fixed_params):
+        """
+        Add results of run_simulation_sweep
+        @param sweep_var: sweep variable
+        @param sweep_values: sweep values
+        @param sweep_results: list of dataframes
+        Optional arguments: values of the other parameters of the surrogate
+        """
+        for val, simulation_results in zip(sweep_values, sweep_results):
+            if simulation_results is not None:
+                self.add_result({**fixed_params, sweep_var: val}, simulation_results)
+
+    def add_store(self, store):
+        """
+        Add all points of a SweepResultStore - sweep dims must match the parameter names
+        @param store: SweepResultStore
+        """
+        for point in store.points():
+            self.add_result(point, store.to_dataframe(**point)[self.trajectory_names])
+
+    def query(self, params: dict, **kwargs):
+        """
+        Query KPIs and trajectories. Simulates if the estimated error exceeds the error bound.
+        @param params: dictionary {param name: value}
+        Optional arguments: passed to simulator.run_simulation
+        @return: dictionary of KPIs, dataframe of trajectories, estimated error, flag if simulated
+        """
+        self.num_queries += 1
+        x = self._param_vector(params)
+        if self.surrogate.num_samples >= max(self.min_samples, len(self.param_names) + 2):
+            estimated_error = float(np.max(self.surrogate.estimate_error(x)))
+            if estimated_error <= self.error_bound:
+                kpi_values, trajectories = self._split_outputs(self.surrogate.predict(x)[0])
+                return kpi_values, trajectories, estimated_error, False
+        out_file_name = f'{self.simulator.model_name_full()}_surrogate_{self.num_simulations}'.replace(".", "_")
+        simulation_results = self.simulator.run_simulation(self.trajectory_names, additional_params=params,
+                                                           out_file_name=out_file_name, **kwargs)
+        self.num_simulations += 1
+        self.add_result(params, simulation_results)
+        kpi_values = {name: func(simulation_results) for name, func in self.kpis.items()}
+        return kpi_values, simulation_results[self.trajectory_names], 0.0, True
+
+    ################################### Private methods ################################################################
+
+    def _param_vector(self, params: dict):
+        return np.array([params[name] for name in self.param_names], dtype=np.float64) / self.param_scales
+
+    def _split_outputs(self, outputs):
+        num_kpis = len(self.kpis)
+        kpi_values = dict(zip(self.kpis.keys(), outputs[:num_kpis]))
+        trajectories = pd.DataFrame(outputs[num_kpis:].reshape(len(self.trajectory_names), -1).T,
+                                    index=self.time_, columns=self.trajectory_names)
+        return kpi_values, trajectories
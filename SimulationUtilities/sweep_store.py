@@ -0,0 +1,181 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import simulation_utils as simutils
+
+
+class SweepResultStore:
+    """
+    Out-of-core store for sweep results.
+    The results are stored as memory-mapped N-D array with dimensions (sweep dims..., time, variable)
+    and labeled coordinates for every dimension. Files in the store directory:
+    - data.npy: result array (.npy format, memory-mapped)
+    - coords.json: dimension names and coordinates
+    Slicing is lazy - only the accessed parts are read from disk.
+    Reductions stream over chunks along the points or time axis.
+    """
+    data_filename = "data.npy"
+    coords_filename = "coords.json"
+
+    def __init__(self, path, mode="r"):
+        """
+        Open existing store
+        @param path: store directory
+        @param mode: memmap mode - "r" (read-only) or "r+" (read-write)
+        """
+        self.path = path
+        with open(os.path.join(path, self.coords_filename), "r") as f:
+            coords = json.load(f)
+        self.dims = coords["dims"]
+        self.coords = {dim: np.array(values) for dim, values in coords["coords"].items()}
+        self.data = np.load(os.path.join(path, self.data_filename), mmap_mode=mode)
+
+    @classmethod
+    def create(cls, path, sweep_coords: dict, time, variables: list, dtype=np.float64):
+        """
+        Create new store - preallocates the result file, filled with NaN
+        @param path: store directory
+        @param sweep_coords: dict {sweep dim: values} - one dimension per swept parameter
+        @param time: time coordinates
+        @param variables: variable names
+        @param dtype: data type of stored values
+        @return: SweepResultStore opened in read-write mode
+        """
+        os.makedirs(path, exist_ok=True)
+        # numpy scalars (e.g. from np.arange) are not JSON serializable
+        coords = {dim: [value.item() if isinstance(value, np.generic) else value for value in values]
+                  for dim, values in sweep_coords.items()}
+        coords.update({"time": [float(t) for t in time], "variable": list(variables)})
+        with open(os.path.join(path, cls.coords_filename), "w") as f:
+            json.dump({"dims": list(coords.keys()), "coords": coords}, f)
+        shape = tuple(len(values) for values in coords.values())
+        data = np.lib.format.open_memmap(os.path.join(path, cls.data_filename), mode="w+", dtype=dtype, shape=shape)
+        data[...] = np.nan
+        data.flush()
+        del data
+        return cls(path, mode="r+")
+
+    ######################################## Properties ################################################################
+
+    @property
+    def sweep_dims(self):
+        return self.dims[:-2]
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def num_points(self):
+        return int(np.prod(self.data.shape[:-2]))
+
+    ######################################## Writing ###################################################################
+
+    def write(self, point, results):
+        """
+        Write results of one sweep point. Results on a different time grid are interpolated.
+        @param point: dict {sweep dim: value}
+        @param results: dataframe with columns = variables and time index
+        """
+        index = self._point_index(point)
+        time = simutils.time_index_to_seconds(results.index)
+        values = results[list(self.coords["variable"])].to_numpy(dtype=self.data.dtype)
+        if len(time) == len(self.coords["time"]) and np.allclose(time, self.coords["time"]):
+            self.data[index] = values
+        else:
+            self.data[index] = np.stack([np.interp(self.coords["time"], time, values[:, i], left=np.nan, right=np.nan)
+                                         for i in range(values.shape[1])], axis=-1)
+
+    def flush(self):
+        if hasattr(self.data, "flush"):
+            self.data.flush()
+
+    ######################################## Lazy access ###############################################################
+
+    def isel(self, **indexers):
+        """
+        Select by index - returns a lazy view on the memory-mapped file
+        @param indexers: {dim: int, slice or list of ints}
+        @return: np.memmap view
+        """
+        return self.data[tuple(indexers.get(dim, slice(None)) for dim in self.dims)]
+
+    def sel(self, **labels):
+        """
+        Select by coordinate labels - returns a lazy view on the memory-mapped file
+        @param labels: {dim: label, list of labels or slice of labels}. Time labels are matched to the nearest time point.
+        @return: np.memmap view
+        """
+        return self.isel(**{dim: self._label_to_index(dim, label) for dim, label in labels.items()})
+
+    def to_dataframe(self, **point):
+        """
+        Load results of a single sweep point
+        @param point: dict {sweep dim: value}
+        @return: dataframe with time index and variable columns
+        """
+        return pd.DataFrame(np.asarray(self.data[self._point_index(point)]), index=self.coords["time"],
+                            columns=self.coords["variable"])
+
+    def points(self):
+        """
+        Iterate over all sweep points
+        @return: generator of dicts {sweep dim: value}
+        """
+        for index in np.ndindex(*self.data.shape[:-2]):
+            yield {dim: self.coords[dim][i].item() for dim, i in zip(self.sweep_dims, index)}
+
+    ######################################## Reductions ################################################################
+
+    def reduce(self, func=np.max, dim="time", chunk_size=64, **kwargs):
+        """
+        Vectorized reduction streaming over chunks. Only one chunk is held in memory at a time.
+        Reductions over time/variable are chunked along the sweep points,
+        reductions over a sweep dim are chunked along time.
+        @param func: numpy reduction function with axis argument, e.g. np.max, np.mean
+        @param dim: dimension to reduce
+        @param chunk_size: number of points or time steps per chunk
+        Optional arguments: passed to func
+        @return: np.ndarray of reduced values
+        """
+        axis = self.dims.index(dim)
+        if dim in ("time", "variable"):
+            data = self.data.reshape((self.num_points,) + self.data.shape[-2:])
+            reduced = np.concatenate([func(np.asarray(data[start:start + chunk_size]), axis=axis - len(self.sweep_dims) + 1, **kwargs)
+                                      for start in range(0, self.num_points, chunk_size)])
+            return reduced.reshape(self.data.shape[:-2] + reduced.shape[1:])
+        time_axis = self.dims.index("time")
+        return np.concatenate([func(np.asarray(self.isel(time=slice(start, start + chunk_size))), axis=axis, **kwargs)
+                               for start in range(0, self.data.shape[time_axis], chunk_size)], axis=time_axis - 1)
+
+    def reduce_to_dataframe(self, func=np.max, chunk_size=64, **kwargs):
+        """
+        Reduce over time for every sweep point - e.g. max over time per point
+        @return: dataframe with one row per sweep point and one column per variable
+        """
+        reduced = self.reduce(func, "time", chunk_size, **kwargs).reshape(self.num_points, -1)
+        index = pd.MultiIndex.from_product([self.coords[dim] for dim in self.sweep_dims], names=self.sweep_dims)
+        return pd.DataFrame(reduced, index=index, columns=self.coords["variable"])
+
+    ######################################## Private methods ###########################################################
+
+    def _point_index(self, point: dict):
+        return tuple(self._label_to_index(dim, point[dim]) for dim in self.sweep_dims)
+
+    def _label_to_index(self, dim, label):
+        coords = self.coords[dim]
+        if isinstance(label, slice):
+            start = None if label.start is None else self._label_to_index(dim, label.start)
+            stop = None if label.stop is None else self._label_to_index(dim, label.stop) + 1
+            return slice(start, stop, label.step)
+        if isinstance(label, (list, tuple, np.ndarray)):
+            return [self._label_to_index(dim, item) for item in label]
+        if dim == "time":
+            return int(np.argmin(np.abs(coords - label)))
+        matches = np.flatnonzero(coords == label)
+        if len(matches) == 0:
+            raise KeyError(f"{label} not found in coordinates of {dim}.")
+        return int(matches[0])
@@ -1,6 +1,7 @@
 import os
 
 from ..SimulationUtilities import simulation_utils as simutils
+from ..SimulationUtilities.input_tables import InputTableCache
 from . import ModelicaSimulator
 from buildingspy.simulate.Simulator import Simulator
 from buildingspy.io.outputfile import Reader
@@ -54,6 +55,17 @@ class BuildingsPySimulator(ModelicaSimulator):
         simulation_results = simutils.create_df(trajectories, trajectory_names)
         return simulation_results
 
+    def _get_result_reader(self, trajectory_names, **kwargs):
+        """
+        Get reader for the results of the last simulation - the result file is read on call.
+        @param trajectory_names: names of trajectories
+        @return: function returning the results
+        """
+        return lambda: self._get_simulation_results(trajectory_names, **kwargs)
+
+    def _get_result_file_path(self, out_file_name):
+        return os.path.join(self.get_data_dir(abspath=True), f"{out_file_name}.mat")
+
     def _simulate_model(self, additional_params=None, **kwargs):
         """
          Simulate model
@@ -67,9 +79,12 @@ class BuildingsPySimulator(ModelicaSimulator):
         sim.setStopTime(self.sim_params.stop_time)
         sim.setNumberOfIntervals(self.sim_params.num_intervals)
         sim.setSolver(self.sim_params.algorithm)
+        sim.setTolerance(self.sim_params.tolerance)
 
         # Set additional parameters - used in sweeps
         sim.addParameters(additional_params)
+        for component_name, (table_path, table_name) in self.input_tables_.items():
+            sim.addModelModifier(InputTableCache.get_table_modifier(component_name, table_path, table_name))
         # sim.showGUI(show=True)
 
         result_file_name = os.path.join(result_directory_path, kwargs.get('out_file_name', self.result_filename))
@@ -0,0 +1,255 @@
+import hashlib
+import os
+import shutil
+import time
+
+import fmpy
+
+from ..SimulationUtilities import simulation_utils as simutils
+from ..SimulationUtilities.solver_statistics import SolverStatistics
+from ..SimulationUtilities.input_tables import InputTableCache
+from .ModelicaSimulator import ModelicaSimulator
+from .DymolaSimulatorNative import DymolaSimulatorNative
+from .fmpyEnsembleSimulator import FMPYEnsembleSimulator
+
+
+class DymolaFMUSimulator(ModelicaSimulator):
+    """
+    Hybrid simulator: Dymola compiles, fmpy simulates.
+    The model is exported once per structure and source version as co-simulation FMU through the native Dymola interface
+    (translateModelFMU) and cached in fmu_cache_dir - an edited model is exported again. All sweep points and experiments are then simulated with fmpy - in parallel, without Dymola.
+    Simulation parameters, initialization values and additional parameters are mapped onto FMU start values.
+    Simulations that cannot be expressed as FMU start values - non-settable parameters or initialization from file -
+    fall back to Dymola.
+    Parameters:
+        - dymola_simulator: DymolaSimulatorNative used for FMU export and fallback simulations
+        - structural_params: names of parameters that change the model structure - a separate FMU is exported per value
+        - fmu_cache_dir: directory of FMU cache
+        - num_instances: number of parallel FMU instances
+    The simulator supports the methods of ModelicaSimulator.
+    Additional Methods:
+    - export_fmu
+    - terminate
+    """
+    dymola_simulator: DymolaSimulatorNative = None
+    structural_params = []
+    fmu_cache_dir = "FMUCache"
+    num_instances = None
+
+    def __init__(self, dymola_simulator=None, structural_params=None, fmu_cache_dir="FMUCache", num_instances=None,
+                 dymolapath="", result_root_dir="./", **kwargs):
+        super().__init__(result_root_dir=result_root_dir, **kwargs)
+        self.dymola_simulator = dymola_simulator if dymola_simulator is not None else \
+            DymolaSimulatorNative(dymolapath=dymolapath, result_root_dir=result_root_dir, **kwargs)
+        self.structural_params = structural_params if structural_params else []
+        self.fmu_cache_dir = fmu_cache_dir
+        self.num_instances = num_instances
+        self.fmu_simulators_ = {}
+        self.model_variables_ = {}
+        self.trajectory_names_ = []
+        self.simulation_results_ = None
+        self.fallback_used_ = False
+        self.last_point_ = {}
+        os.makedirs(self.get_fmu_cache_dir(abspath=True), exist_ok=True)
+
+    def __del__(self):
+        self.terminate()
+
+    def terminate(self):
+        """
+        Free all FMU instances and close Dymola
+        """
+        for fmu_simulator in self.fmu_simulators_.values():
+            fmu_simulator.terminate()
+        self.fmu_simulators_ = {}
+        if self.dymola_simulator is not None:
+            self.dymola_simulator.terminate()
+
+    def get_fmu_cache_dir(self, abspath=False):
+        return os.path.join(self.get_root_dir(abspath), self.fmu_cache_dir)
+
+    ######################################## Simulation ################################################################
+
+    def run_simulation(self, trajectory_names: list, store_csv=False, **kwargs):
+        """
+        Run simulation - FMU if all parameters are settable, Dymola otherwise
+        @param trajectory_names: names of trajectories to return
+        @param store_csv: enable storing to csv file
+        Optional parameter out_file_name: select output filename
+        @return: Simulation results
+        """
+        self.trajectory_names_ = trajectory_names
+        return super().run_simulation(trajectory_names, store_csv=store_csv, **kwargs)
+
+    def run_simulation_sweep(self, trajectory_names: list, sweep_var: str, sweep_values: list, store_csv=False, **kwargs):
+        """
+        Run sweep simulation - all sweep points sharing an FMU are simulated in parallel
+        @param trajectory_names: Trajectories to return
+        @param sweep_var: Variable to sweep over
+        @param sweep_values: Sweep values
+        @param store_csv: enable storing to csv file
+        """
+        additional_params = kwargs.pop('additional_params', None) or {}
+        points = [{**additional_params, sweep_var: val} for val in sweep_values]
+        out_file_names = [f'{self.model_name_full()}_{sweep_var}_{val}'.replace(".", "_") for val in sweep_values]
+        sweep_results = [None] * len(points)
+        self.sweep_points_ = points
+        self.sweep_statistics_ = [None] * len(points)
+        # Group points by FMU - fallback points are simulated with Dymola one by one
+        groups = {}
+        with self._cache_source_hashes():
+            for index, point in enumerate(points):
+                if self._requires_fallback(point):
+                    sweep_results[index] = self._run_fallback(trajectory_names, store_csv, additional_params=point,
+                                                              out_file_name=out_file_names[index], sweep_var=sweep_var, **kwargs)
+                    self.sweep_statistics_[index] = self.dymola_simulator.solver_statistics_
+                else:
+                    groups.setdefault(self.export_fmu(self._get_structural_values(point)), []).append(index)
+        for fmu_path, indices in groups.items():
+            fmu_simulator = self._get_fmu_simulator(fmu_path)
+            wall_start = time.perf_counter()
+            sim_time, results = fmu_simulator.run_ensemble([self._get_start_values(points[index]) for index in indices],
+                                                           output_names=trajectory_names)
+            duration = (time.perf_counter() - wall_start) / len(indices)
+            for point_index, index in enumerate(indices):
+                sweep_results[index] = simutils.create_df([sim_time] + list(results[point_index].T), ["Time"] + trajectory_names)
+                self.sweep_statistics_[index] = fmu_simulator.ensemble_statistics_[point_index]
+                csv_path = None
+                if store_csv:
+                    csv_path = self._get_csv_path(out_file_names[index])
+                    sweep_results[index].to_csv(csv_path, sep=";", index_label="Zeitraum")
+                self._add_to_catalog(sweep_results[index], duration, csv_path=csv_path, out_file_name=out_file_names[index],
+                                     solver_statistics=self.sweep_statistics_[index], additional_params=points[index],
+                                     sweep_var=sweep_var)
+        return sweep_results
+
+    def export_fmu(self, structural_values=None):
+        """
+        Export model as co-simulation FMU - only if not cached yet.
+        @param structural_values: dict {structural param: value} - applied as modifiers
+        @return: path to FMU
+        """
+        structural_values = structural_values if structural_values else {}
+        fmu_path = self._get_fmu_path(structural_values)
+        if os.path.exists(fmu_path):
+            return fmu_path
+        modifiers = ",".join([f"{key}={value}" for key, value in structural_values.items()] +
+                             [InputTableCache.get_table_modifier(component_name, table_path, table_name)
+                              for component_name, (table_path, table_name) in self.input_tables_.items()])
+        model_to_translate = f"{self.model_name_full()}({modifiers})" if modifiers else self.model_name_full()
+        fmu_name = os.path.splitext(os.path.basename(fmu_path))[0]
+        dymola_simulator = self.dymola_simulator
+        try:
+            dymola_simulator._open_dymola()
+            # Same packages as in the cache key (source hashes)
+            dymola_simulator._open_packages(self.workdir_path, self.package_paths_full)
+            dymola_simulator.dymola.cd(self.get_fmu_cache_dir(abspath=True))
+            print(f"Exporting FMU: {model_to_translate}")
+            result = dymola_simulator.dymola.translateModelFMU(model_to_translate, False, fmu_name, "2", "cs", False)
+            if not result:
+                raise Exception("FMU export failed.")
+            exported_path = os.path.join(self.get_fmu_cache_dir(abspath=True), f"{result}.fmu")
+            if os.path.abspath(exported_path) != os.path.abspath(fmu_path):
+                shutil.move(exported_path, fmu_path)
+        except Exception as ex:
+            dymola_simulator._handle_dymola_exception(ex)
+            dymola_simulator._close_dymola()
+            raise
+        return fmu_path
+
+    ######################### Private methods ##################################################
+
+    def _simulate_model(self, additional_params=None, **kwargs):
+        """
+        Simulate model - FMU if possible, Dymola otherwise
+        @param additional_params: additional params to set before simulation
+        """
+        point = additional_params if additional_params else {}
+        self.last_point_ = point
+        self.fallback_used_ = self._requires_fallback(point)
+        if self.fallback_used_:
+            self._sync_dymola_simulator()
+            self.dymola_simulator._simulate_model(additional_params=additional_params, **kwargs)
+        else:
+            fmu_path = self.export_fmu(self._get_structural_values(point))
+            sim_time, results = self._get_fmu_simulator(fmu_path).run_ensemble([self._get_start_values(point)],
+                                                                               output_names=self.trajectory_names_)
+            self.simulation_results_ = simutils.create_df([sim_time] + list(results[0].T), ["Time"] + self.trajectory_names_)
+
+    def _get_solver_statistics(self, wall_time=None, **kwargs):
+        if self.fallback_used_:
+            return self.dymola_simulator._get_solver_statistics(wall_time, **kwargs)
+        fmu_simulator = self._get_fmu_simulator(self.export_fmu(self._get_structural_values(self.last_point_)))
+        statistics = SolverStatistics(**fmu_simulator.ensemble_statistics_[0].to_dict())
+        statistics.wall_time = wall_time
+        return statistics
+
+    def _get_simulation_results(self, trajectory_names, **kwargs):
+        if self.fallback_used_:
+            return self.dymola_simulator._get_simulation_results(trajectory_names, **kwargs)
+        return self.simulation_results_[trajectory_names]
+
+    def _init_experiment(self, exp_name="", **kwargs):
+        """
+        Initialize experiment - initialization from file is only possible in Dymola
+        """
+        if self.init_params.use_init_file:
+            self._sync_dymola_simulator()
+            self.dymola_simulator._init_experiment(exp_name, **kwargs)
+
+    def _run_fallback(self, trajectory_names, store_csv=False, **kwargs):
+        print(f"Fallback to Dymola: {kwargs.get('additional_params', None)}")
+        self._sync_dymola_simulator()
+        return self.dymola_simulator.run_simulation(trajectory_names, store_csv=store_csv, **kwargs)
+
+    def _sync_dymola_simulator(self):
+        """
+        Use the same parameters in the Dymola simulator
+        """
+        self.dymola_simulator.set_sim_params(self.sim_params)
+        self.dymola_simulator.init_params = self.init_params
+        self.dymola_simulator.result_catalog = self.result_catalog
+        self.dymola_simulator.input_tables_ = self.input_tables_
+
+    def _requires_fallback(self, point: dict):
+        """
+        Check if a point can be simulated with the FMU
+        @return: True if initialization from file is used or a parameter is not settable as start value
+        """
+        if self.init_params.use_init_file:
+            return True
+        start_values = self._get_start_values(point)
+        if not start_values:
+            return False
+        fmu_path = self.export_fmu(self._get_structural_values(point))
+        if fmu_path not in self.model_variables_:
+            self.model_variables_[fmu_path] = {variable.name: variable for variable in fmpy.read_model_description(fmu_path).modelVariables}
+        variables = self.model_variables_[fmu_path]
+        return not all(name in variables and FMPYEnsembleSimulator._is_settable(variables[name]) for name in start_values.keys())
+
+    def _get_start_values(self, point: dict):
+        """
+        Map additional parameters and initialization values onto FMU start values
+        """
+        start_values = {key: val for key, val in point.items() if key not in self.structural_params}
+        if self.init_params.use_init_values:
+            start_values.update(self.init_params.init_variables)
+        return start_values
+
+    def _get_structural_values(self, point: dict):
+        return {key: point[key] for key in self.structural_params if key in point}
+
+    def _get_fmu_path(self, point: dict):
+        structural_values = self._get_structural_values(point)
+        # Source hashes - an edited model is exported again
+        fmu_key = sorted(structural_values.items()) + sorted(self.input_tables_.items()) + sorted(self._get_source_hashes().items())
+        key = hashlib.sha256(repr(fmu_key).encode()).hexdigest()[:12] if fmu_key else "default"
+        return os.path.join(self.get_fmu_cache_dir(abspath=True), f"{self.model_name_full().replace('.', '_')}_{key}.fmu")
+
+    def _get_fmu_simulator(self, fmu_path):
+        if fmu_path not in self.fmu_simulators_:
+            self.fmu_simulators_[fmu_path] = FMPYEnsembleSimulator(fmu_filename=fmu_path, num_instances=self.num_instances,
+                                                                   result_root_dir=self.get_root_dir())
+        fmu_simulator = self.fmu_simulators_[fmu_path]
+        fmu_simulator.set_sim_params(self.sim_params)
+        return fmu_simulator
@@ -39,6 +39,8 @@ class DymolaSimulator(DymolaSimulatorNative):
     - run_dymola_scripts
     """
     script_dir = "Scripts"
+    fmu_paths_full = []
+    job_resources = {"dymola_licenses": 1, "cores": 1}
 
     def __init__(self, script_dir="Scripts", **kwargs):
         super().__init__(**kwargs)
@@ -49,6 +51,7 @@ class DymolaSimulator(DymolaSimulatorNative):
         """
         Setup experiment.
         """
+        self.fmu_paths_full = fmu_paths_full
         setup_commands = DymolaCommands.create_setup_cmds(self.workdir_path, self.package_paths_full + package_paths,
                                                           self.package_name, fmu_paths_full)
         self.execute_commands(setup_commands, f"setup_script_{exp_name}.mos")
@@ -64,7 +67,18 @@ class DymolaSimulator(DymolaSimulatorNative):
         """
         return super().run_experiment(exp_name, trajectory_names, start_time, stop_time,
                                       plot_enabled=plot_enabled, store_csv=store_csv,
-                                      script_name=f"simulation_script_{exp_name}.mos", **kwargs)
+                                      **self._get_experiment_kwargs(exp_name), **kwargs)
+
+    def create_experiment_jobs(self, exp_name="", sim_params=None, trajectory_names=[], init_filename=None,
+                               depends_on=[], setup=True, duration_estimate=1.0, init_state_from=None, state_variables=None,
+                               store_csv=True, **kwargs):
+        """
+        Create scheduler jobs for the phases of an experiment: setup -> init (importInitialResult or state handoff) -> simulate.
+        Each job runs a separate MOS script in the Dymola instance of this simulator.
+        """
+        return super().create_experiment_jobs(exp_name, sim_params, trajectory_names, init_filename, depends_on, setup,
+                                              duration_estimate, init_state_from, state_variables, store_csv=store_csv,
+                                              **self._get_experiment_kwargs(exp_name), **kwargs)
 
     def execute_commands(self, commands, script_name=""):
         """
@@ -134,13 +148,25 @@ class DymolaSimulator(DymolaSimulatorNative):
             self._export_equations(out_file_name)
         cmds = DymolaCommands.create_sim_cmds_extended(simulation_parameters=self.sim_params,
                                                        workdir_path=self.workdir_path,
-                                                       model_name_full=self.model_name_full(),
+                                                       model_name_full=self._get_simulation_problem().replace('"', '\\"'),
                                                        resultfile_path_full=os.path.join(self.get_data_dir(), out_file_name),
                                                        use_init=self.init_params.use_init_values,
                                                        init_variables=self.init_params.init_variables,
                                                        additional_parameters=additional_params)
         self.execute_commands(cmds, script_name)
 
+    def _get_experiment_kwargs(self, exp_name=""):
+        """
+        Each experiment uses its own simulation script
+        """
+        return {"script_name": f"simulation_script_{exp_name}.mos"}
+
+    def _get_source_paths(self):
+        """
+        Get source files the simulated model depends on - including the imported FMUs
+        """
+        return super()._get_source_paths() + [path for path in self.fmu_paths_full if path]
+
     ############################### Commands ##########################################################################
 
     def _init_experiment(self, exp_name="", **kwargs):
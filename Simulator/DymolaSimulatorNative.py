@@ -1,6 +1,8 @@
 import os
 
 from ..SimulationUtilities import simulation_utils as simutils
+from ..SimulationUtilities import result_files
+from ..SimulationUtilities import solver_statistics
 from .ModelicaSimulator import ModelicaSimulator
 
 
@@ -11,10 +13,12 @@ class DymolaSimulatorNative(ModelicaSimulator):
     Base class: see ModelicaSimulator
     Additional:
     - terminate
+    Solver statistics are read from dslog_path (default: dslog.txt in the working directory) and the result file.
     """
     dymolapath = ""
     dymola = None
     show_dymola_window = False
+    dslog_path = ""
 
     def __init__(self, dymolapath="", show_dymola_window=False, **kwargs):
         super().__init__(**kwargs)
@@ -60,6 +64,22 @@ class DymolaSimulatorNative(ModelicaSimulator):
         if self.dymola is not None:
             print(self.dymola.getLastErrorLog())
 
+    def _open_packages(self, workdir_path, package_paths_full):
+        """
+        Add the package of the working directory to the Modelica path and open it and all additional packages
+        (package.mo files, package directories or single .mo files - see DependencyTracker.find_package_files)
+        @param workdir_path: directory of package
+        @param package_paths_full: paths of additional packages
+        """
+        self.dymola.AddModelicaPath(workdir_path)
+        package_files = [os.path.abspath(os.path.join(workdir_path, "package.mo"))]
+        for path in package_paths_full:
+            path = os.path.join(path, "package.mo") if path and os.path.isdir(path) else path
+            if path and path.endswith(".mo") and os.path.isfile(path) and os.path.abspath(path) not in package_files:
+                package_files.append(os.path.abspath(path))
+        for path in package_files:
+            self.dymola.openModel(path)
+
     def _export_equations(self, model_name):
         """
             Get simulation results from Dymola output file.
@@ -97,6 +117,40 @@ class DymolaSimulatorNative(ModelicaSimulator):
             self._handle_dymola_exception(ex)
             self._close_dymola()
 
+    def _get_result_reader(self, trajectory_names, **kwargs):
+        """
+        Get reader for the results of the last simulation - reads the result file without Dymola.
+        @param trajectory_names: names of trajectories to return
+        @return: function returning the results
+        """
+        result_path = self._get_result_file_path(kwargs.get('out_file_name', self.result_filename))
+        return lambda: result_files.read_trajectories(result_path, trajectory_names)
+
+    def _get_result_file_path(self, out_file_name):
+        return os.path.join(self.get_data_dir(abspath=True), f"{out_file_name}.mat")
+
+    def _init_experiment(self, exp_name="", **kwargs):
+        """
+        Initialize Experiment based on init file - importInitialResult
+        """
+        if self.init_params.use_init_file:
+            try:
+                self._open_dymola()
+                init_file_path = os.path.join(self.get_data_dir(abspath=True), f"{self.init_params.init_filename}.mat")
+                if not self.dymola.importInitialResult(init_file_path, self.sim_params.start_time):
+                    raise Exception(f"Import of initial result {init_file_path} failed.")
+            except Exception as ex:
+                self._handle_dymola_exception(ex)
+                self._close_dymola()
+
+    def _get_solver_statistics(self, wall_time=None, **kwargs):
+        """
+        Get solver statistics from dslog.txt and the result file (CPUtime, EventCounter) - must be called before the next simulation
+        """
+        dslog_path = self.dslog_path if self.dslog_path else os.path.join(self.workdir_path, "dslog.txt")
+        result_path = self._get_result_file_path(kwargs.get('out_file_name', self.result_filename))
+        return solver_statistics.read_dymola_statistics(dslog_path, result_path, wall_time)
+
     def _simulate_model(self,
                         additional_params=None,
                         export_equations_enabled=False,
@@ -113,8 +167,7 @@ class DymolaSimulatorNative(ModelicaSimulator):
             # Instantiate the Dymola interface and start Dymola
             self._open_dymola()
             # Add package to Modelica path and open model
-            self.dymola.AddModelicaPath(self.workdir_path)
-            self.dymola.openModel(os.path.join(self.workdir_path, "package.mo"))
+            self._open_packages(self.workdir_path, self.package_paths_full)
             # Set additional parameters - used in sweeps
             if additional_params:
                 for param_key, param_val in additional_params.items():
@@ -124,15 +177,28 @@ class DymolaSimulatorNative(ModelicaSimulator):
 
             result_file = os.path.join(self.get_data_dir(), out_file_name)
             # Simulate Model
-            simulation_success = self.dymola.simulateModel(self.model_name_full,
-                                                           startTime=self.sim_params.start_time,
-                                                           stopTime=self.sim_params.stop_time,
-                                                           numberOfIntervals=self.sim_params.num_intervals,
-                                                           outputInterval=self.sim_params.output_interval,
-                                                           tolerance=self.sim_params.tolerance,
-                                                           fixedstepsize=self.sim_params.fixed_stepsize,
-                                                           method=self.sim_params.algorithm,
-                                                           resultFile=result_file)
+            if self.init_params.use_init_values and self.init_params.init_variables:
+                simulation_success, _ = self.dymola.simulateExtendedModel(self._get_simulation_problem(),
+                                                                          startTime=self.sim_params.start_time,
+                                                                          stopTime=self.sim_params.stop_time,
+                                                                          numberOfIntervals=self.sim_params.num_intervals,
+                                                                          outputInterval=self.sim_params.output_interval,
+                                                                          method=self.sim_params.algorithm,
+                                                                          tolerance=self.sim_params.tolerance,
+                                                                          fixedstepsize=self.sim_params.fixed_stepsize,
+                                                                          resultFile=result_file,
+                                                                          initialNames=list(self.init_params.init_variables.keys()),
+                                                                          initialValues=list(self.init_params.init_variables.values()))
+            else:
+                simulation_success = self.dymola.simulateModel(self._get_simulation_problem(),
+                                                               startTime=self.sim_params.start_time,
+                                                               stopTime=self.sim_params.stop_time,
+                                                               numberOfIntervals=self.sim_params.num_intervals,
+                                                               outputInterval=self.sim_params.output_interval,
+                                                               tolerance=self.sim_params.tolerance,
+                                                               fixedstepsize=self.sim_params.fixed_stepsize,
+                                                               method=self.sim_params.algorithm,
+                                                               resultFile=result_file)
             if not simulation_success:
                 raise Exception("Dymola Simulation failed.")
         except Exception as ex:
@@ -1,6 +1,19 @@
+import contextlib
+import dataclasses
+import itertools
 import os
+import time
 
 from ..SimulationUtilities import simulation_utils as simutils
+from ..SimulationUtilities import result_files
+from ..SimulationUtilities import bulk_loader
+from ..SimulationUtilities.dependency_tracking import DependencyTracker
+from ..SimulationUtilities.sweep_store import SweepResultStore
+from ..SimulationUtilities.job_scheduler import Job
+from ..SimulationUtilities.result_catalog import ResultCatalog
+from ..SimulationUtilities.solver_statistics import SolverStatistics, rank_statistics
+from ..SimulationUtilities.input_tables import InputTableCache
+from ..SimulationUtilities.regression import RegressionComparison
 from ..SimulationUtilities.Parameters import SimulationParameters, SimulatorDirs, InitializationParameters
 
 
@@ -11,8 +24,15 @@ class ModelicaSimulator:
     Simulation:
     - run_simulation
     - run_simulation_sweep
+    - run_simulation_sweep_to_store
+    - run_simulation_sweep_continuation
+    - load_sweep_results
+    - compare_sweep_to_baseline
     - setup_experiment
     - run_experiment
+    Scheduling:
+    - create_experiment_jobs
+    - create_experiment_chain_jobs
     Plotting:
     - plot_simulation_results
     - plot_multiple_results
@@ -31,6 +51,19 @@ class ModelicaSimulator:
     Setters:
     - set_start_time
     - set_stop_time
+    Incremental re-simulation:
+    - enable_dependency_tracking
+    Inputs:
+    - set_input_table
+    Result catalog:
+    - enable_result_catalog
+    Solver statistics:
+    - get_sweep_report
+    State handoff:
+    - run_experiment_chain
+    - get_final_state
+    - set_initial_state
+    state_handoff: "memory" - final state is passed as init values, "file" - final state is written to a tiny init file
     """
     workdir_path = ""
     package_paths_full = ["package.mo"]
@@ -41,12 +74,23 @@ class ModelicaSimulator:
     result_dirs: SimulatorDirs = SimulatorDirs()
     sim_params: SimulationParameters = SimulationParameters()
     init_params: InitializationParameters = InitializationParameters()
+    dependency_tracker: DependencyTracker = None
+    result_catalog: ResultCatalog = None
+    solver_statistics_: SolverStatistics = None
+    sweep_points_ = None
+    sweep_statistics_ = None
+    input_table_cache: InputTableCache = None
+    source_hashes_ = None
+    source_hash_depth_ = 0
+    job_resources = {"cores": 1}
+    state_handoff = "memory"
 
     def __init__(self, result_root_dir="./", **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
         self.result_dirs = SimulatorDirs(result_root_dir, "SimulationResults", "ResultData", "Plots")
         self.result_dirs.create_directories()
+        self.input_tables_ = {}
 
     ############################ Main methods #################################################
 
@@ -80,14 +124,32 @@ class ModelicaSimulator:
         @return: Simulation results
         """
         out_file_name = kwargs.get('out_file_name', self.result_filename)
-        self._simulate_model(**kwargs)
-        simulation_results = self._get_simulation_results(trajectory_names, out_file_name=out_file_name)
-        if store_csv:
-            try:
-                results_path = os.path.join(self.get_data_dir(abspath=True), f"{out_file_name}.csv")
-                simulation_results.to_csv(results_path, sep=";", index_label="Zeitraum", date_format='%d.%m.%Y %H:%M')
-            except AttributeError:
-                print("Simulation results do not exist.")
+        with self._cache_source_hashes():
+            if self._results_up_to_date(trajectory_names, **kwargs):
+                # Nothing was simulated - no statistics
+                self.solver_statistics_ = None
+                return self._load_stored_results(trajectory_names, out_file_name)
+            start_timestamp = time.time()
+            wall_start = time.perf_counter()
+            self._simulate_model(**kwargs)
+            duration = time.perf_counter() - wall_start
+            self.solver_statistics_ = self._get_solver_statistics(duration, out_file_name=out_file_name)
+            simulation_results = self._get_simulation_results(trajectory_names, out_file_name=out_file_name)
+            csv_path = None
+            if store_csv or self.dependency_tracker is not None:
+                try:
+                    csv_path = self._get_csv_path(out_file_name)
+                    simulation_results.to_csv(csv_path, sep=";", index_label="Zeitraum", date_format='%d.%m.%Y %H:%M')
+                    if self._simulation_succeeded(start_timestamp, out_file_name):
+                        self._record_dependencies([csv_path], **kwargs)
+                    elif self.dependency_tracker is not None:
+                        # Results may be left over from a previous simulation - never reuse them
+                        print(f"Simulation {out_file_name} not successful - results are not reused.")
+                        self.dependency_tracker.invalidate(out_file_name)
+                except AttributeError:
+                    csv_path = None
+                    print("Simulation results do not exist.")
+        self._add_to_catalog(simulation_results, duration, csv_path=csv_path, solver_statistics=self.solver_statistics_, **kwargs)
         return simulation_results
 
     def run_simulation_sweep(self, trajectory_names: list, sweep_var: str, sweep_values: list, store_csv=False, **kwargs):
@@ -98,9 +160,109 @@ class ModelicaSimulator:
         @param sweep_values: Sweep values
         @param store_csv: enable storing to csv file
         """
-        return [self.run_simulation(trajectory_names, store_csv=store_csv, additional_params={sweep_var: val},
-                                    out_file_name=f'{self.model_name_full()}_{sweep_var}_{val}'.replace(".", "_"), **kwargs)
-                for val in sweep_values]
+        self.sweep_points_, self.sweep_statistics_ = [], []
+        sweep_results = []
+        # Fixed additional parameters are shared by all points
+        additional_params = kwargs.pop('additional_params', None) or {}
+        for val in sweep_values:
+            sweep_results.append(self.run_simulation(trajectory_names, store_csv=store_csv,
+                                                     additional_params={**additional_params, sweep_var: val},
+                                                     out_file_name=f'{self.model_name_full()}_{sweep_var}_{val}'.replace(".", "_"),
+                                                     sweep_var=sweep_var, **kwargs))
+            self.sweep_points_.append({sweep_var: val})
+            self.sweep_statistics_.append(self.solver_statistics_)
+        return sweep_results
+
+    def run_simulation_sweep_to_store(self, trajectory_names: list, sweep_params: dict, store_path: str, **kwargs):
+        """
+        Run sweep simulation over a grid of parameters and write the results to an out-of-core store.
+        Only the result of the current sweep point is held in memory.
+        @param trajectory_names: Trajectories to store
+        @param sweep_params: Dictionary {sweep variable: sweep values} - all combinations are simulated
+        @param store_path: Directory of result store
+        @return: SweepResultStore with dimensions (sweep variables..., time, variable)
+        """
+        # Fixed additional parameters are shared by all points
+        additional_params = kwargs.pop('additional_params', None) or {}
+        store = None
+        self.sweep_points_, self.sweep_statistics_ = [], []
+        for point_values in itertools.product(*sweep_params.values()):
+            point = dict(zip(sweep_params.keys(), point_values))
+            out_file_name = f'{self.model_name_full()}_' + "_".join(f'{key}_{val}' for key, val in point.items())
+            simulation_results = self.run_simulation(trajectory_names, additional_params={**additional_params, **point},
+                                                     out_file_name=out_file_name.replace(".", "_"), **kwargs)
+            self.sweep_points_.append(point)
+            self.sweep_statistics_.append(self.solver_statistics_)
+            if simulation_results is None:
+                continue
+            if store is None:
+                store = SweepResultStore.create(store_path, sweep_params, self._get_store_time_grid(simulation_results), trajectory_names)
+            store.write(point, simulation_results)
+        if store is not None:
+            store.flush()
+        return store
+
+    def load_sweep_results(self, trajectory_names: list, sweep_var: str, sweep_values: list, **kwargs):
+        """
+        Load the results of a sweep from the result files concurrently - without Dymola
+        @param trajectory_names: Trajectories to load
+        @param sweep_var: Variable of sweep
+        @param sweep_values: Sweep values
+        Optional arguments: passed to bulk_loader.load_results, e.g. max_workers, use_processes, progress
+        @return: dataframe with index (sweep value, time)
+        """
+        return bulk_loader.load_results(self._get_sweep_result_files(sweep_var, sweep_values), trajectory_names,
+                                        level_name=sweep_var, **kwargs)
+
+    def compare_sweep_to_baseline(self, trajectory_names: list, sweep_var: str, sweep_values: list, baseline_dir: str, **kwargs):
+        """
+        Compare the results of a sweep against baseline results with the same file names - chunked and in parallel
+        @param trajectory_names: Trajectories to compare
+        @param sweep_var: Variable of sweep
+        @param sweep_values: Sweep values
+        @param baseline_dir: directory of baseline result files
+        Optional arguments: passed to RegressionComparison, e.g. tolerances, atol, rtol, chunk_size, max_workers
+        @return: summary, failing windows - see RegressionComparison.compare_many. Points without baseline fail as missing.
+        """
+        pairs = {val: (path, os.path.join(baseline_dir, os.path.basename(path)))
+                 for val, path in self._get_sweep_result_files(sweep_var, sweep_values).items()}
+        return RegressionComparison(trajectory_names, **kwargs).compare_many(pairs)
+
+    def run_simulation_sweep_continuation(self, trajectory_names: list, sweep_var: str, sweep_values: list, store_csv=False,
+                                          continuation_variables=None, **kwargs):
+        """
+        Run sweep simulation with continuation warm starts.
+        Points are simulated in order of parameter distance, starting from the first sweep value.
+        The initialization of each point is seeded from the solution of its nearest solved neighbour:
+        - continuation_variables given: their values at start time are used as initialization values
+        - otherwise: initialization from the result file of the neighbour (simulator-specific, e.g. importInitialResult)
+        @param trajectory_names: Trajectories to return
+        @param sweep_var: Variable to sweep over
+        @param sweep_values: Sweep values - numeric
+        @param store_csv: enable storing to csv file
+        @param continuation_variables: names of variables to seed, e.g. states or iteration variables - optional
+        @return: list of results in order of sweep_values
+        """
+        # Fixed additional parameters are shared by all points
+        additional_params = kwargs.pop('additional_params', None) or {}
+        out_file_names = [f'{self.model_name_full()}_{sweep_var}_{val}'.replace(".", "_") for val in sweep_values]
+        sweep_results = [None] * len(sweep_values)
+        self.sweep_points_ = [{**additional_params, sweep_var: val} for val in sweep_values]
+        self.sweep_statistics_ = [None] * len(sweep_values)
+        warm_start_values = {}
+        backup = self._get_warm_start_backup()
+        try:
+            for index, neighbour in self._get_continuation_order(sweep_values):
+                if neighbour is not None:
+                    self._apply_warm_start(out_file_names[neighbour], warm_start_values.get(neighbour), **kwargs)
+                sweep_results[index] = self.run_simulation(trajectory_names, store_csv=store_csv, additional_params=self.sweep_points_[index],
+                                                           out_file_name=out_file_names[index], sweep_var=sweep_var, **kwargs)
+                self.sweep_statistics_[index] = self.solver_statistics_
+                if sweep_results[index] is not None and continuation_variables:
+                    warm_start_values[index] = self._get_warm_start_values(continuation_variables, out_file_name=out_file_names[index])
+        finally:
+            self._restore_warm_start_backup(backup)
+        return sweep_results
 
     def plot_multiple_results(self, results, set_colors=False, **kwargs):
         """
@@ -137,13 +299,231 @@ class ModelicaSimulator:
         self.set_start_time(start_time)
         self.set_stop_time(stop_time)
         out_file_name = f'{self.result_filename}_{exp_name}'
-        self._init_experiment(exp_name, **kwargs)
-        simulation_results = self.run_simulation(trajectory_names=trajectory_names, out_file_name=out_file_name, **kwargs)
+        with self._cache_source_hashes():
+            if not self._results_up_to_date(trajectory_names, out_file_name=out_file_name, **kwargs):
+                self._init_experiment(exp_name, **kwargs)
+            simulation_results = self.run_simulation(trajectory_names=trajectory_names, out_file_name=out_file_name,
+                                                     exp_name=exp_name, **kwargs)
         if plot_enabled:
             self.plot_simulation_results(simulation_results, out_file_name=out_file_name, show_legend=True, show_ylabel=True)
 
         return simulation_results
 
+    def get_sweep_report(self, by="cpu_time", ascending=False):
+        """
+        Rank the points of the last sweep by solver cost - most expensive first.
+        Points reused from stored results (dependency tracking) have no statistics.
+        @param by: ranking criterion - field of SolverStatistics, e.g. cpu_time, num_state_events, num_rejected_steps
+        @param ascending: sort order
+        @return: dataframe - one row per sweep point
+        """
+        if not self.sweep_statistics_:
+            raise Exception("No sweep statistics - run a sweep first.")
+        return rank_statistics(self.sweep_points_, self.sweep_statistics_, by=by, ascending=ascending)
+
+    ############################################ State handoff #######################################################
+
+    def run_experiment_chain(self, sim_params_list: list, trajectory_names=[], state_variables=None, exp_prefix="exp", **kwargs):
+        """
+        Run a chain of experiments, e.g. from SimulationParameters.create_params.
+        Each experiment starts from the final state of the previous one - only the final state is handed over.
+        @param sim_params_list: list of simulation parameters
+        @param trajectory_names: Names of trajectories to return
+        @param state_variables: names of state variables to hand over - None: continuous states (see get_final_state)
+        @param exp_prefix: prefix of experiment names
+        Optional arguments: passed to run_simulation
+        The simulation and initialization parameters are restored afterwards.
+        @return: list of simulation results
+        """
+        backup = self._get_warm_start_backup()
+        sim_params_backup = self.sim_params
+        results = []
+        state = None
+        try:
+            for index, sim_params in enumerate(sim_params_list):
+                exp_name = f"{exp_prefix}_{index}"
+                out_file_name = f'{self.result_filename}_{exp_name}'
+                self.set_sim_params(sim_params)
+                if state is not None:
+                    self.set_initial_state(state, exp_name)
+                self._init_experiment(exp_name, **kwargs)
+                results.append(self.run_simulation(trajectory_names, out_file_name=out_file_name, exp_name=exp_name, **kwargs))
+                state = self.get_final_state(state_variables, out_file_name=out_file_name)
+        finally:
+            self.set_sim_params(sim_params_backup)
+            self._restore_warm_start_backup(backup)
+        return results
+
+    def get_final_state(self, state_variables=None, **kwargs):
+        """
+        Get final state of the last simulation - only the last row of the result file is read
+        @param state_variables: names of variables - None: continuous states of the result file (variables x with der(x))
+        Optional parameter: out_file_name: result filename
+        @return: dict {name: value}
+        """
+        out_file_name = kwargs.get('out_file_name', self.result_filename)
+        result_path = self._get_result_file_path(out_file_name)
+        if result_path is not None and result_path.endswith(".mat") and os.path.isfile(result_path):
+            result_file = result_files.DymolaResultFile(result_path)
+            if state_variables is None:
+                # Parameters, aliases and derivatives are not handed over
+                state_variables = [name for name in result_file.names if f"der({name})" in result_file.name_index]
+                if not state_variables:
+                    raise Exception(f"No continuous states in {result_path} - pass state_variables.")
+            names = state_variables
+            names = [name for name, exists in zip(names, result_file.exist_trajectories(names)) if exists]
+            return {name: float(value) for name, value in result_file.get_final_values(names).items()}
+        if state_variables is None:
+            raise Exception("State variables are required - the simulator has no result file.")
+        simulation_results = self._get_simulation_results(list(state_variables), out_file_name=out_file_name)
+        if simulation_results is None:
+            raise Exception(f"No results for {out_file_name}.")
+        return {name: float(simulation_results[name].iloc[-1]) for name in state_variables if name in simulation_results.columns}
+
+    def set_initial_state(self, state, exp_name="", **kwargs):
+        """
+        Initialize the next simulation from a state, e.g. the final state of the previous experiment
+        state_handoff "memory": the state is set as init values
+        state_handoff "file": the state is written to a tiny init file (one time point) and imported
+        @param state: dict {name: value}
+        @param exp_name: name of experiment
+        """
+        if not isinstance(state, dict):
+            raise Exception("Unsupported state - use a dict of variable values.")
+        # Own copy - the default initialization parameters are shared by all simulators
+        self.init_params = dataclasses.replace(self.init_params, init_variables=dict(self.init_params.init_variables))
+        if self.state_handoff == "file":
+            init_filename = f"{self.result_filename}_{exp_name}_initial_state"
+            result_files.write_initial_state(os.path.join(self.get_data_dir(abspath=True), f"{init_filename}.mat"), state,
+                                             self.sim_params.start_time)
+            self.set_init_file(init_filename)
+            self.use_init_file(True)
+            self.use_init_vals(False)
+            self._init_experiment(exp_name, **kwargs)
+        else:
+            self.set_init_variables(dict(state))
+            self.use_init_vals(True)
+            self.use_init_file(False)
+
+    ############################################ Inputs ##############################################################
+
+    def set_input_table(self, component_name: str, inputs, table_name="inputs"):
+        """
+        Use time-series inputs for a CombiTimeTable component of the model.
+        The inputs are compiled once into a content-hashed MAT file, which is shared read-only by all runs -
+        the component is redirected to this file with a modifier.
+        @param component_name: name of CombiTimeTable component, e.g. "weatherTable"
+        @param inputs: pd.DataFrame (index: time), structured array or dict with field "time"
+        @param table_name: name of table matrix
+        @return: path to compiled table, column names (column i + 2 in the table)
+        """
+        if self.input_table_cache is None:
+            self.input_table_cache = InputTableCache(os.path.join(self.get_data_dir(abspath=True), "InputTables"))
+        table_path, names = self.input_table_cache.compile_table(inputs, table_name)
+        self.input_tables_[component_name] = (table_path, table_name)
+        return table_path, names
+
+    def _get_simulation_problem(self):
+        """
+        Get model name with modifiers of input tables - e.g. Package.Model(table(tableOnFile=true, ...))
+        """
+        modifiers = [InputTableCache.get_table_modifier(component_name, table_path, table_name)
+                     for component_name, (table_path, table_name) in self.input_tables_.items()]
+        return f"{self.model_name_full()}({', '.join(modifiers)})" if modifiers else self.model_name_full()
+
+    ############################################ Scheduling ##########################################################
+
+    def create_experiment_jobs(self, exp_name="", sim_params: SimulationParameters = None, trajectory_names=[],
+                               init_filename=None, depends_on=[], setup=True, duration_estimate=1.0, init_state_from=None,
+                               state_variables=None, **kwargs):
+        """
+        Create scheduler jobs for the phases of an experiment: setup -> init -> simulate.
+        The jobs of one simulator must not run concurrently - chain them through dependencies
+        and use one simulator instance per independent chain.
+        @param exp_name: Experiment name
+        @param sim_params: Simulation parameters of experiment - default: current parameters
+        @param trajectory_names: Names of trajectories to return
+        @param init_filename: Result file (without extension) to initialize from - None: no initialization from file
+        @param depends_on: Names of jobs the experiment depends on, e.g. the simulation job of the previous experiment
+        @param setup: Create setup job
+        @param duration_estimate: Estimated duration of the simulation job
+        @param init_state_from: Result file (without extension) whose final state initializes the experiment (see set_initial_state)
+        @param state_variables: Names of handed over state variables - None: continuous states
+        Optional arguments: passed to run_simulation
+        @return: list of jobs
+        """
+        sim_params = sim_params if sim_params is not None else self.sim_params
+        prefix = f"{self.model_name_full()}_{exp_name}"
+        jobs = []
+        dependencies = list(depends_on)
+        if setup:
+            jobs.append(Job(name=f"{prefix}_setup", func=lambda: self.setup_experiment(exp_name=exp_name),
+                            dependencies=dependencies, resources=dict(self.job_resources), duration_estimate=0.1 * duration_estimate))
+            dependencies = [jobs[-1].name]
+        # Initialization state of the experiment - restored after the simulation
+        warm_start_backup = []
+
+        def init_experiment():
+            # Modifies a copy of the initialization parameters on the instance (see _get_warm_start_backup)
+            warm_start_backup.append(self._get_warm_start_backup())
+            try:
+                self.set_sim_params(sim_params)
+                if init_filename is not None:
+                    self.set_init_file(init_filename)
+                    self.use_init_file(True)
+                elif init_state_from is not None:
+                    self.set_initial_state(self.get_final_state(state_variables, out_file_name=init_state_from), exp_name)
+                    if self.state_handoff == "file":
+                        # Already initialized from the written init file
+                        return
+                self._init_experiment(exp_name)
+            except Exception:
+                self._restore_warm_start_backup(warm_start_backup.pop())
+                raise
+        jobs.append(Job(name=f"{prefix}_init", func=init_experiment, dependencies=dependencies,
+                        resources=dict(self.job_resources), duration_estimate=0.1 * duration_estimate))
+        dependencies = [jobs[-1].name]
+
+        def simulate():
+            try:
+                self.set_sim_params(sim_params)
+                return self.run_simulation(trajectory_names, out_file_name=f'{self.result_filename}_{exp_name}',
+                                           exp_name=exp_name, **kwargs)
+            finally:
+                if warm_start_backup:
+                    self._restore_warm_start_backup(warm_start_backup.pop())
+        jobs.append(Job(name=f"{prefix}_simulate", func=simulate, dependencies=dependencies,
+                        resources=dict(self.job_resources), duration_estimate=duration_estimate))
+        return jobs
+
+    def create_experiment_chain_jobs(self, sim_params_list: list, trajectory_names=[], exp_prefix="exp", depends_on=[],
+                                     state_handoff=False, state_variables=None, **kwargs):
+        """
+        Create scheduler jobs for a chain of experiments, e.g. from SimulationParameters.create_params.
+        Each experiment is initialized from the result of the previous one.
+        @param sim_params_list: list of simulation parameters
+        @param trajectory_names: Names of trajectories to return
+        @param exp_prefix: prefix of experiment names
+        @param depends_on: Names of jobs the chain depends on
+        @param state_handoff: hand over only the final state instead of importing the full result file
+        @param state_variables: Names of handed over state variables - None: continuous states
+        Optional arguments: passed to create_experiment_jobs
+        @return: list of jobs
+        """
+        jobs = []
+        init_filename = None
+        for index, sim_params in enumerate(sim_params_list):
+            exp_name = f"{exp_prefix}_{index}"
+            duration_estimate = max(sim_params.stop_time - sim_params.start_time, 1.0)
+            jobs += self.create_experiment_jobs(exp_name, sim_params, trajectory_names,
+                                                init_filename=None if state_handoff else init_filename,
+                                                depends_on=[jobs[-1].name] if jobs else depends_on, setup=(index == 0),
+                                                duration_estimate=duration_estimate,
+                                                init_state_from=init_filename if state_handoff else None,
+                                                state_variables=state_variables, **kwargs)
+            init_filename = f'{self.result_filename}_{exp_name}'
+        return jobs
+
     ############################################ Helper methods ########################################################
 
     def model_name_full(self):
@@ -188,6 +568,115 @@ class ModelicaSimulator:
         """
         return None
 
+    def _get_result_reader(self, trajectory_names, **kwargs):
+        """
+        Get reader for the results of the last simulation. The reader is called without arguments
+        and must not depend on simulator state that changes with the next simulation - it may run on another thread.
+        Default: results are extracted immediately.
+        @param trajectory_names: names of trajectories
+        @return: function returning the results
+        """
+        simulation_results = self._get_simulation_results(trajectory_names, **kwargs)
+        return lambda: simulation_results
+
+    def _get_experiment_kwargs(self, exp_name=""):
+        """
+        Get simulator-specific simulation arguments of an experiment
+        @param exp_name: name of experiment
+        @return: dict of arguments
+        """
+        return {}
+
+    @staticmethod
+    def _get_continuation_order(sweep_values):
+        """
+        Order sweep points for continuation - each next point is the unsolved point closest to a solved one
+        @return: list of (index, index of nearest solved neighbour or None)
+        """
+        values = [float(val) for val in sweep_values]
+        if not values:
+            return []
+        # Solved points are always a contiguous range of the sorted values - expand it outward from the first point
+        ranks = sorted(range(len(values)), key=lambda index: (values[index], index))
+        left = right = ranks.index(0)
+        order = [(0, None)]
+        while left > 0 or right < len(ranks) - 1:
+            left_distance = values[ranks[left]] - values[ranks[left - 1]] if left > 0 else float("inf")
+            right_distance = values[ranks[right + 1]] - values[ranks[right]] if right < len(ranks) - 1 else float("inf")
+            if left_distance < right_distance or (left_distance == right_distance and ranks[left - 1] < ranks[right + 1]):
+                left -= 1
+                order.append((ranks[left], ranks[left + 1]))
+            else:
+                right += 1
+                order.append((ranks[right], ranks[right - 1]))
+        return order
+
+    def _get_warm_start_values(self, continuation_variables, **kwargs):
+        """
+        Get values of continuation variables at start time from the results of the last simulation
+        @param continuation_variables: names of variables
+        Optional parameter: out_file_name: result filename
+        @return: dict {name: value}
+        """
+        simulation_results = self._get_simulation_results(list(continuation_variables), **kwargs)
+        if simulation_results is None:
+            return None
+        return {name: float(simulation_results[name].iloc[0]) for name in continuation_variables if name in simulation_results.columns}
+
+    def _apply_warm_start(self, neighbour_out_file_name, warm_start_values=None, **kwargs):
+        """
+        Seed the initialization of the next simulation from a solved neighbour
+        @param neighbour_out_file_name: result filename of neighbour
+        @param warm_start_values: values of continuation variables of neighbour - None: initialize from result file
+        """
+        if warm_start_values:
+            self.init_params.init_variables.update(warm_start_values)
+            self.use_init_vals(True)
+        else:
+            self.set_init_file(neighbour_out_file_name)
+            self.use_init_file(True)
+            self._init_experiment(f"continuation_{neighbour_out_file_name}", **kwargs)
+
+    def _get_warm_start_backup(self):
+        """
+        Backup of the initialization state modified by warm starts.
+        Warm starts modify a copy on the instance - the original parameters (e.g. the class-level default shared by
+        all simulators) are not modified and are restored afterwards.
+        """
+        backup = self.init_params
+        self.init_params = dataclasses.replace(backup, init_variables=dict(backup.init_variables))
+        return backup
+
+    def _restore_warm_start_backup(self, backup):
+        self.init_params = backup
+
+    def _get_solver_statistics(self, wall_time=None, **kwargs):
+        """
+        Get solver statistics of the last simulation
+        @param wall_time: wall time of simulation in s
+        Optional parameter: out_file_name: result filename
+        Override this for simulator-specific statistics
+        @return: SolverStatistics
+        """
+        return SolverStatistics(wall_time=wall_time)
+
+    def _get_result_file_path(self, out_file_name):
+        """
+        Get path of the simulator result file (e.g. .mat)
+        @param out_file_name: result filename
+        @return: path or None if the simulator does not write a result file
+        """
+        return None
+
+    def _get_store_time_grid(self, simulation_results):
+        """
+        Get time grid of sweep result store - output grid of simulation parameters or time of the first result
+        """
+        if self.sim_params.output_interval > 0:
+            num_timesteps = int(round((self.sim_params.stop_time - self.sim_params.start_time) / self.sim_params.output_interval)) + 1
+            return [self.sim_params.start_time + i * self.sim_params.output_interval for i in range(num_timesteps)]
+        return simutils.time_index_to_seconds(simulation_results.index)
+
     def _init_experiment(self, exp_name="", **kwargs):
         """
         Initialize Experiment
@@ -204,6 +693,174 @@ class ModelicaSimulator:
         """
         return None
 
+    ######################### Incremental re-simulation ################################################################
+
+    def enable_dependency_tracking(self, manifest_path=None):
+        """
+        Enable change-aware re-simulation. Results are only re-simulated if their sources, parameters or inputs changed.
+        Otherwise, the stored csv results are reused.
+        @param manifest_path: Path to manifest - default: dependencies.json in data dir
+        """
+        manifest_path = manifest_path if manifest_path else os.path.join(self.get_data_dir(abspath=True), "dependencies.json")
+        self.dependency_tracker = DependencyTracker(manifest_path)
+
+    def _get_source_paths(self):
+        """
+        Get source files the simulated model depends on.
+        Override this for simulator-specific sources.
+        @return: list of file paths
+        """
+        return DependencyTracker.find_model_sources(self.model_name_full(), self.package_paths_full + [self.workdir_path])
+
+    def _get_dependency_inputs(self, **kwargs):
+        """
+        Get all inputs that influence the simulation result.
+        Override this for simulator-specific inputs.
+        @return: dict of inputs
+        """
+        init_inputs = {"init_file_hash": ""}
+        if self.init_params.use_init_file:
+            init_file_path = os.path.join(self.get_data_dir(), f"{self.init_params.init_filename}.mat")
+            if os.path.isfile(init_file_path):
+                init_inputs["init_file_hash"] = DependencyTracker.hash_file(init_file_path)
+        return {"model_name": self.model_name_full(),
+                "sim_params": self.sim_params.to_json(),
+                "init_params": self.init_params.to_json(),
+                "additional_params": kwargs.get('additional_params', None),
+                "input_tables": self.input_tables_,
+                **init_inputs}
+
+    def _get_source_hashes(self):
+        """
+        Get hashes of the source files - hashed once per run_simulation or run_experiment call (see _cache_source_hashes)
+        @return: dict {path: hash}
+        """
+        if self.source_hash_depth_ == 0:
+            return DependencyTracker.hash_sources(self._get_source_paths())
+        if self.source_hashes_ is None:
+            self.source_hashes_ = DependencyTracker.hash_sources(self._get_source_paths())
+        return self.source_hashes_
+
+    @contextlib.contextmanager
+    def _cache_source_hashes(self):
+        """
+        Hash the source files at most once within this context - nested contexts share the hashes
+        """
+        self.source_hash_depth_ += 1
+        try:
+            yield
+        finally:
+            self.source_hash_depth_ -= 1
+            if self.source_hash_depth_ == 0:
+                self.source_hashes_ = None
+
+    def _simulation_succeeded(self, start_timestamp, out_file_name):
+        """
+        Check if the last simulation verifiably succeeded: the solver did not report a failure and the result file
+        (if the simulator writes one) was written by this simulation - failed runs may leave the previous result file
+        @param start_timestamp: time.time() at the start of the simulation
+        @param out_file_name: result filename
+        """
+        if self.solver_statistics_ is not None and self.solver_statistics_.success is False:
+            return False
+        result_path = self._get_result_file_path(out_file_name)
+        if result_path is None:
+            return True
+        # Compare in full seconds - file systems with coarse timestamps
+        return os.path.isfile(result_path) and os.path.getmtime(result_path) >= int(start_timestamp)
+
+    def _results_up_to_date(self, trajectory_names, **kwargs):
+        """
+        Check if stored results can be reused
+        @param trajectory_names: names of trajectories
+        Optional parameter: out_file_name: result filename
+        @return: True if dependency tracking is enabled and no dependency changed
+        """
+        if self.dependency_tracker is None:
+            return False
+        out_file_name = kwargs.get('out_file_name', self.result_filename)
+        source_hashes = self._get_source_hashes()
+        input_hash = DependencyTracker.hash_inputs(**self._get_dependency_inputs(**kwargs))
+        if not self.dependency_tracker.is_up_to_date(out_file_name, source_hashes, input_hash):
+            return False
+        stored_columns = simutils.read_result_csv(self._get_csv_path(out_file_name), nrows=0).columns
+        return all(name in stored_columns for name in self._get_result_columns(trajectory_names))
+
+    def _record_dependencies(self, result_files, **kwargs):
+        """
+        Record dependencies of a stored result - only if dependency tracking is enabled
+        @param result_files: paths of stored result files
+        Optional parameter: out_file_name: result filename
+        """
+        if self.dependency_tracker is not None:
+            self.dependency_tracker.record(kwargs.get('out_file_name', self.result_filename), self.model_name_full(),
+                                           self._get_source_hashes(),
+                                           DependencyTracker.hash_inputs(**self._get_dependency_inputs(**kwargs)),
+                                           result_files)
+
+    def _load_stored_results(self, trajectory_names, out_file_name):
+        """
+        Load stored results from csv file - same columns as a fresh simulation
+        """
+        print(f"Reusing unchanged results: {out_file_name}")
+        return simutils.read_result_csv(self._get_csv_path(out_file_name))[self._get_result_columns(trajectory_names)]
+
+    def _get_result_columns(self, trajectory_names):
+        """
+        Get columns of the simulation results - override if a simulator returns additional columns
+        @param trajectory_names: names of trajectories
+        @return: list of column names
+        """
+        return list(trajectory_names)
+
+    def _get_sweep_result_files(self, sweep_var, sweep_values):
+        """
+        Get result files of sweep points - simulator result file if it exists, csv file otherwise
+        @return: dict {sweep value: path}
+        """
+        result_files = {}
+        for val in sweep_values:
+            out_file_name = f'{self.model_name_full()}_{sweep_var}_{val}'.replace(".", "_")
+            result_path = self._get_result_file_path(out_file_name)
+            result_files[val] = result_path if result_path is not None and os.path.exists(result_path) else self._get_csv_path(out_file_name)
+        return result_files
+
+    def _get_csv_path(self, out_file_name):
+        return os.path.join(self.get_data_dir(abspath=True), f"{out_file_name}.csv")
+
+    ######################### Result catalog ###########################################################################
+
+    def enable_result_catalog(self, db_path=None):
+        """
+        Enable result catalog. Every simulation is indexed with parameters, timings, file paths and variable statistics.
+        @param db_path: Path to SQLite database - default: results.sqlite in data dir
+        """
+        db_path = db_path if db_path else os.path.join(self.get_data_dir(abspath=True), "results.sqlite")
+        self.result_catalog = ResultCatalog(db_path)
+
+    def _add_to_catalog(self, simulation_results, duration=None, csv_path=None, solver_statistics=None, **kwargs):
+        """
+        Add simulation result to result catalog - only if the catalog is enabled
+        @param simulation_results: simulation results
+        @param duration: simulation wall time in s
+        @param csv_path: path of stored csv file
+        @param solver_statistics: SolverStatistics of run
+        Optional parameters: out_file_name, additional_params, sweep_var, exp_name
+        @return: run id or None
+        """
+        if self.result_catalog is None:
+            return None
+        out_file_name = kwargs.get('out_file_name', self.result_filename)
+        additional_params = kwargs.get('additional_params', None)
+        sweep_var = kwargs.get('sweep_var', None)
+        sweep_value = additional_params.get(sweep_var, None) if sweep_var and additional_params else None
+        return self.result_catalog.add_run(self.model_name_full(), out_file_name, simulation_results,
+                                           sim_params=self.sim_params, init_params=self.init_params,
+                                           additional_params=additional_params, sweep_var=sweep_var,
+                                           sweep_value=sweep_value, result_path=self._get_result_file_path(out_file_name),
+                                           csv_path=csv_path, duration=duration, exp_name=kwargs.get('exp_name', ""),
+                                           simulator=type(self).__name__, solver_statistics=solver_statistics)
+
     ##################### Initialization parameters ####################################################################
 
     def set_init_params_full(self, init_file: str, init_variables: dict):
@@ -2,4 +2,7 @@ from . ModelicaSimulator import ModelicaSimulator
 from . BuildingsPySimulator import BuildingsPySimulator
 from . DymolaSimulatorNative import DymolaSimulatorNative
 from . DymolaSimulator import DymolaSimulator
-from .fmpySimulator import FMPYSimulator
\ No newline at end of file
+from .fmpySimulator import FMPYSimulator
+from .fmpyEnsembleSimulator import FMPYEnsembleSimulator
+from .DymolaFMUSimulator import DymolaFMUSimulator
+from .fmuStepper import FMUStepper
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import fmpy
+import fmpy.fmi2
+from pandas import DataFrame
+from ..SimulationUtilities.solver_statistics import SolverStatistics
+from .fmpySimulator import FMPYSimulator
+
+
+class FMPYEnsembleSimulator(FMPYSimulator):
+    """
+    Ensemble simulator based on FMPY library - Simulate N copies of the same FMU concurrently.
+    The FMU is extracted once and instantiated num_instances times with unique instance names.
+    Co-simulation steps run in native code (ctypes releases the GIL), so the instances are driven by a thread pool.
+    Results of all points are written to one preallocated array of shape (points, time, variables).
+    Parameters:
+        - num_instances: number of FMU instances (= number of worker threads)
+    Additional Methods:
+    - run_ensemble
+    - terminate
+    """
+    num_instances = 1
+    model_description_ = None
+    fmu_instances_ = None
+    ensemble_time_ = None
+    ensemble_results_ = None
+    ensemble_statistics_ = None
+
+    def __init__(self, num_instances=None, **kwargs):
+        super().__init__(**kwargs)
+        self.num_instances = num_instances if num_instances else os.cpu_count()
+        self.fmu_instances_ = []
+
+    def __del__(self):
+        self.terminate()
+
+    def terminate(self):
+        """
+        Free all FMU instances of the ensemble.
+        """
+        # Not set if the construction failed
+        for fmu in self.fmu_instances_ or []:
+            fmu.freeInstance()
+        self.fmu_instances_ = []
+
+    def run_ensemble(self, start_values_list: list, input_data_list=None, output_names=None, step_finished=None):
+        """
+        Run ensemble simulation - one point per entry of start_values_list
+        @param start_values_list: list of start value dicts, one per point
+        @param input_data_list: optional list of input arrays, one per point (input scenarios).
+        Default: self.input_data for all points
+        @param output_names: names of output variables - default: self.output_feature_names
+        @param step_finished: optional callback (point index, time, fmpy recorder) called after each step.
+        Returning False stops the simulation of this point - the remaining results stay NaN.
+        Solver statistics of each point are stored in self.ensemble_statistics_.
+        @return: time vector, result array of shape (points, time, variables)
+        """
+        output_names = output_names if output_names else self.output_feature_names
+        if input_data_list is None:
+            input_data_list = [self.input_data] * len(start_values_list)
+        if len(input_data_list) != len(start_values_list):
+            raise Exception("Number of input scenarios and start values do not match.")
+        self._instantiate_ensemble()
+
+        output_interval = self._get_output_interval()
+        num_timesteps = int(round((self.sim_params.stop_time - self.sim_params.start_time) / output_interval)) + 1
+        self.ensemble_time_ = self.sim_params.start_time + np.arange(num_timesteps) * output_interval
+        self.ensemble_results_ = np.full((len(start_values_list), num_timesteps, len(output_names)), np.nan)
+        self.ensemble_statistics_ = [SolverStatistics(num_steps=0, success=False) for _ in start_values_list]
+
+        free_instances = queue.Queue()
+        for fmu in self.fmu_instances_:
+            free_instances.put(fmu)
+
+        def simulate_point(index):
+            statistics = self.ensemble_statistics_[index]
+
+            def step_callback(step_time, recorder):
+                statistics.num_steps += 1
+                return step_finished(index, step_time, recorder) if step_finished else True
+
+            fmu = free_instances.get()
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                fmu.reset()
+                result = fmpy.simulate_fmu(filename=self.fmu_dir,
+                                           model_description=self.model_description_,
+                                           start_time=self.sim_params.start_time,
+                                           stop_time=self.sim_params.stop_time,
+                                           output_interval=output_interval,
+                                           relative_tolerance=self.sim_params.tolerance,
+                                           start_values=dict(start_values_list[index]),
+                                           input=input_data_list[index],
+                                           output=output_names,
+                                           fmi_type='CoSimulation',
+                                           fmu_instance=fmu,
+                                           step_finished=step_callback)
+                num_rows = min(result.size, num_timesteps)
+                for var_index, name in enumerate(output_names):
+                    self.ensemble_results_[index, :num_rows, var_index] = result[name][:num_rows]
+                statistics.success = num_rows == num_timesteps
+            finally:
+                statistics.cpu_time = time.thread_time() - cpu_start
+                statistics.wall_time = time.perf_counter() - wall_start
+                free_instances.put(fmu)
+
+        with ThreadPoolExecutor(max_workers=len(self.fmu_instances_)) as executor:
+            # Consume results to propagate exceptions
+            list(executor.map(simulate_point, range(len(start_values_list))))
+        return self.ensemble_time_, self.ensemble_results_
+
+    def run_simulation_sweep(self, trajectory_names: list, sweep_var: str, sweep_values: list, store_csv=False, **kwargs):
+        """
+        Run sweep simulation - all sweep points are simulated concurrently
+        @param trajectory_names: Trajectories to return
+        @param sweep_var: Variable to sweep over
+        @param sweep_values: Sweep values
+        @param store_csv: enable storing to csv file
+        Optional parameter: additional_params: parameters set for all points - applied as start values
+        @return: list of dataframes - views on self.ensemble_results_
+        """
+        additional_params = kwargs.get('additional_params', None) or {}
+        start_values = {**(self.start_values_ or {}), **additional_params}
+        wall_start = time.perf_counter()
+        sim_time, results = self.run_ensemble([{**start_values, sweep_var: val} for val in sweep_values], output_names=trajectory_names)
+        duration = (time.perf_counter() - wall_start) / max(len(sweep_values), 1)
+        sweep_results = [DataFrame(results[index], index=sim_time, columns=trajectory_names) for index in range(len(sweep_values))]
+        self.sweep_points_ = [{sweep_var: val} for val in sweep_values]
+        self.sweep_statistics_ = self.ensemble_statistics_
+        for val, simulation_results, statistics in zip(sweep_values, sweep_results, self.ensemble_statistics_):
+            out_file_name = f'{self.model_name_full()}_{sweep_var}_{val}'.replace(".", "_")
+            results_path = None
+            if store_csv:
+                results_path = os.path.join(self.get_data_dir(abspath=True), f"{out_file_name}.csv")
+                simulation_results.to_csv(results_path, sep=";", index_label="Zeitraum")
+            self._add_to_catalog(simulation_results, duration, csv_path=results_path, solver_statistics=statistics,
+                                 out_file_name=out_file_name, additional_params={**additional_params, sweep_var: val}, sweep_var=sweep_var)
+        return sweep_results
+
+    ######################### Private methods ##################################################
+
+    def _get_output_interval(self):
+        """
+        Output interval of simulation parameters - derived from number of intervals if not set
+        """
+        if self.sim_params.output_interval > 0 or self.sim_params.num_intervals <= 0:
+            return self.sim_params.output_interval
+        return (self.sim_params.stop_time - self.sim_params.start_time) / self.sim_params.num_intervals
+
+    def _instantiate_ensemble(self):
+        """
+        Extract FMU once and create num_instances instances with unique instance names.
+        """
+        if len(self.fmu_instances_) == self.num_instances:
+            return
+        self.terminate()
+        self.model_description_ = fmpy.read_model_description(self.fmu_filename)
+        self.fmu_dir = fmpy.extract(self.fmu_filename)
+        for index in range(self.num_instances):
+            fmu = fmpy.fmi2.FMU2Slave(guid=self.model_description_.guid,
+                                      unzipDirectory=self.fmu_dir,
+                                      modelIdentifier=self.model_description_.coSimulation.modelIdentifier,
+                                      instanceName=f"{self.fmu_instance_name}_{index}")
+            fmu.instantiate()
+            self.fmu_instances_.append(fmu)
@@ -1,8 +1,14 @@
+import json
+import os
+import time
+
 import numpy as np
 import fmpy
 import fmpy.fmi2
-import numpy.lib.recfunctions as rfs
+from fmpy.simulation import Input, apply_start_values, settable_in_instantiated, settable_in_initialization_mode
 from pandas import DataFrame
+from ..SimulationUtilities.solver_statistics import SolverStatistics
+from ..SimulationUtilities.input_tables import InputTableCache
 from .ModelicaSimulator import ModelicaSimulator
 
 
@@ -14,6 +20,13 @@ class FMPYSimulator(ModelicaSimulator):
         - FMU filename
         - FMU instance name
         - input and output feature names
+        - memmap_output: write outputs directly to a memory-mapped .npy file in the data dir while stepping.
+          Results are returned as views on the file and survive the process (see simulation_utils.read_memmap_result).
+          Integer and Boolean outputs are stored as float64. The results only contain the outputs - unlike the
+          in-memory results, there are no input data columns (data_<name>).
+        - memmap_chunk_size: number of output rows buffered in memory before they are written to the file
+        - keep_fmu_state: store the serialized FMU state at the end of each simulation (fmu_state_) - used by
+          get_final_state to hand the complete state to the next experiment (FMU capability canGetAndSetFMUstate required)
     """
     fmu_dir = ""
     fmu_filename = ""
@@ -24,6 +37,14 @@ class FMPYSimulator(ModelicaSimulator):
     simulation_results_ = None
     fmu_ = None
     start_values_ = None
+    default_start_values_ = None
+    model_description_ = None
+    memmap_output = False
+    memmap_chunk_size = 4096
+    keep_fmu_state = False
+    fmu_state_ = None
+    initial_fmu_state_ = None
+    fmu_statistics_: SolverStatistics = None
 
     def __init__(self, fmu_filename="", input_feature_names=None, output_feature_names=None, input_data=None, fmu_instance_name="UUT",
                  init_vals=None, **kwargs):
@@ -35,6 +56,23 @@ class FMPYSimulator(ModelicaSimulator):
         self.fmu_instance_name = fmu_instance_name
         self.start_values_ = init_vals
 
+    def set_input_data(self, inputs):
+        """
+        Set input data - compiled once into a content-hashed, read-only .npy file shared by all runs
+        @param inputs: pd.DataFrame (index: time), structured array or dict with field "time"
+        @return: input array (memory-mapped)
+        """
+        if self.input_table_cache is None:
+            self.input_table_cache = InputTableCache(os.path.join(self.get_data_dir(abspath=True), "InputTables"))
+        self.input_data = self.input_table_cache.compile_fmu_input(inputs)
+        return self.input_data
+
+    def set_input_table(self, component_name: str, inputs, table_name="inputs"):
+        """
+        FMU inputs are set with set_input_data - the table of an exported FMU cannot be redirected.
+        """
+        raise Exception("Input tables are not supported for FMUs - use set_input_data.")
+
     def _get_simulation_results(self, trajectory_names, **kwargs):
         """
         Get simulation results from result file
@@ -42,6 +80,8 @@ class FMPYSimulator(ModelicaSimulator):
         @return: pd.DataFrame containing results
         Additional arguments: optional - not used here
         """
+        if self.memmap_output:
+            return self._get_memmap_results(trajectory_names)
         simulation_results = {}
         for name in trajectory_names:
             simulation_results.update({name: np.array(self.simulation_results_[name])})
@@ -50,12 +90,44 @@ class FMPYSimulator(ModelicaSimulator):
                 raise Exception("Sizes of simulation results and input data do not match.")
         return DataFrame(simulation_results, index=np.array(self.simulation_results_["Time"]))
 
+    def _get_result_columns(self, trajectory_names):
+        """
+        Results contain the input data of each output as data_<name> - except for memory-mapped outputs
+        """
+        if self.memmap_output:
+            return list(trajectory_names)
+        return [column for name in trajectory_names for column in (name, f"data_{name}")]
+
+    def _get_source_paths(self):
+        """
+        Get source files the simulation depends on - the FMU
+        """
+        return [self.fmu_filename]
+
+    def _get_dependency_inputs(self, **kwargs):
+        """
+        Get all inputs that influence the simulation result - including input data and start values.
+        Default start values are filled in by _init_experiment from input data and init params, which are already
+        part of the inputs - they are not hashed, so results can be checked before the FMU is instantiated.
+        """
+        start_values = self.start_values_ if self.start_values_ is not self.default_start_values_ else None
+        initial_fmu_state = np.frombuffer(self.initial_fmu_state_, dtype=np.uint8) if self.initial_fmu_state_ is not None else None
+        return {**super()._get_dependency_inputs(**kwargs), "input_data": self.input_data, "start_values": start_values,
+                "initial_fmu_state": initial_fmu_state}
+
+    def _results_up_to_date(self, trajectory_names, **kwargs):
+        """
+        The final FMU state is not stored with the results - simulations that keep the FMU state are always run
+        """
+        return not self.keep_fmu_state and super()._results_up_to_date(trajectory_names, **kwargs)
+
     def _extract_and_instantiate_FMU(self):
         """
         Extract model description and instantiate FMU
         @return: fmpy.FMI2.FMUSlave object
         """
         model_description = fmpy.read_model_description(self.fmu_filename)
+        self.model_description_ = model_description
         self.fmu_dir = fmpy.extract(self.fmu_filename)
         fmu = fmpy.fmi2.FMU2Slave(guid=model_description.guid,
                         unzipDirectory=self.fmu_dir,
@@ -74,6 +146,7 @@ class FMPYSimulator(ModelicaSimulator):
         if self.start_values_ is None:
             init_values = self.input_data[0] if not self.init_params.use_init_values else list(self.init_params.init_variables.values())
             self.start_values_ = {name: init_values[name] for name in self.input_feature_names + self.output_feature_names}
+            self.default_start_values_ = self.start_values_
 
     def _simulate_model(self, **kwargs):
         """
@@ -81,17 +154,255 @@ class FMPYSimulator(ModelicaSimulator):
         Simulator-specific simulation methods
         Simulation results are stored as member self.simulation_results
         """
+        # Additional parameters (e.g. sweep values) are applied as start values
+        start_values = {**(self.start_values_ or {}), **(kwargs.get('additional_params', None) or {})}
+        self.fmu_state_ = None
+        if self.memmap_output:
+            self._simulate_model_to_memmap(kwargs.get('out_file_name', self.result_filename), start_values)
+            return
+        # CPU time of this thread - the FMU runs in native code on the calling thread
+        cpu_start = time.thread_time()
+        self.fmu_statistics_ = SolverStatistics(num_steps=0, success=False)
+        initial_fmu_state, self.initial_fmu_state_ = self.initial_fmu_state_, None
         result = fmpy.simulate_fmu(filename=self.fmu_dir,
                                    start_time=self.sim_params.start_time,
                                    stop_time=self.sim_params.stop_time,
                                    step_size=self.sim_params.output_interval,
                                    output_interval=self.sim_params.output_interval,
-                                   start_values=self.start_values_,
+                                   relative_tolerance=self.sim_params.tolerance,
+                                   # A restored FMU state is not initialized again - start values cannot be applied
+                                   start_values=start_values if initial_fmu_state is None else {},
                                    input=self.input_data,
                                    output=self.output_feature_names,
                                    fmi_type='CoSimulation',
-                                   fmu_instance=self.fmu_)
-        self.simulation_results_ = rfs.rename_fields(result, {"time": "Time"})
+                                   fmu_instance=self.fmu_,
+                                   fmu_state=initial_fmu_state,
+                                   terminate=not self.keep_fmu_state,
+                                   step_finished=self._count_step)
+        if self.keep_fmu_state:
+            self._store_fmu_state()
+            self.fmu_.terminate()
+        self.fmu_statistics_.cpu_time = time.thread_time() - cpu_start
+        self.fmu_statistics_.success = True
+        # Rename in place - no copy of the result array
+        result.dtype.names = ("Time",) + result.dtype.names[1:]
+        self.simulation_results_ = result
+
+    def _simulate_model_to_memmap(self, out_file_name, start_values=None):
+        """
+        Simulate model and write outputs step by step to a .npy file (columns: Time, outputs).
+        Only memmap_chunk_size rows are held in memory. self.simulation_results_ is a read-only memmap of the file.
+        @param out_file_name: name of result file
+        @param start_values: dict of start values
+        """
+        fmu = self.fmu_
+        model_description = self.model_description_
+        output_interval = self.sim_params.output_interval
+        start_time, stop_time = self.sim_params.start_time, self.sim_params.stop_time
+        num_steps = int(round((stop_time - start_time) / output_interval))
+        output_groups = self._get_output_groups(fmu, model_description)
+        num_outputs = len(self.output_feature_names)
+
+        result_path = self._get_result_file_path(out_file_name)
+        with open(f"{os.path.splitext(result_path)[0]}.json", "w") as f:
+            json.dump({"names": ["Time"] + list(self.output_feature_names)}, f)
+        result_file = np.lib.format.open_memmap(result_path, mode="w+", dtype=np.float64,
+                                                shape=(num_steps + 1, num_outputs + 1))
+        data_offset = result_file.offset
+        del result_file
+
+        cpu_start = time.thread_time()
+        self.fmu_statistics_ = SolverStatistics(num_steps=0, success=False)
+        fmu_input = Input(fmu, model_description, self.input_data)
+        initial_fmu_state, self.initial_fmu_state_ = self.initial_fmu_state_, None
+        if initial_fmu_state is not None:
+            self._restore_fmu_state(initial_fmu_state)
+        else:
+            fmu.reset()
+            fmu.setupExperiment(tolerance=self.sim_params.tolerance, startTime=start_time)
+            start_values = apply_start_values(fmu, model_description, dict(start_values or {}), settable=settable_in_instantiated)
+            fmu.enterInitializationMode()
+            apply_start_values(fmu, model_description, start_values, settable=settable_in_initialization_mode)
+            fmu_input.apply(start_time)
+            fmu.exitInitializationMode()
+        self.fmu_statistics_.init_time = time.thread_time() - cpu_start
+
+        buffer = np.empty((min(self.memmap_chunk_size, num_steps + 1), num_outputs + 1))
+        with open(result_path, "r+b") as f:
+            f.seek(data_offset)
+            buffer_rows = 0
+            step_time = start_time
+            for step in range(num_steps + 1):
+                if step > 0:
+                    fmu_input.apply(step_time)
+                    fmu.doStep(currentCommunicationPoint=step_time, communicationStepSize=output_interval)
+                    step_time = start_time + step * output_interval
+                    self.fmu_statistics_.num_steps += 1
+                buffer[buffer_rows, 0] = step_time
+                for getter, value_references, columns in output_groups:
+                    buffer[buffer_rows, columns] = getter(value_references)
+                buffer_rows += 1
+                if buffer_rows == buffer.shape[0]:
+                    f.write(buffer.tobytes())
+                    buffer_rows = 0
+            f.write(buffer[:buffer_rows].tobytes())
+        if self.keep_fmu_state:
+            self._store_fmu_state()
+        fmu.terminate()
+        self.fmu_statistics_.cpu_time = time.thread_time() - cpu_start
+        self.fmu_statistics_.success = True
+        self.simulation_results_ = np.load(result_path, mmap_mode="r")
+
+    def _get_output_groups(self, fmu, model_description):
+        """
+        Group outputs by type for reading - like the fmpy recorder
+        @return: list of (getter, value references, buffer columns)
+        """
+        variables = {variable.name: variable for variable in model_description.modelVariables}
+        getters = {"Real": fmu.getReal, "Integer": fmu.getInteger, "Enumeration": fmu.getInteger, "Boolean": fmu.getBoolean}
+        unsupported = [name for name in self.output_feature_names if variables[name].type not in getters]
+        if unsupported:
+            raise Exception(f"Outputs {unsupported} cannot be stored in a memory-mapped result - only numeric outputs are supported.")
+        output_groups = []
+        for type_name, getter in getters.items():
+            columns = [index + 1 for index, name in enumerate(self.output_feature_names) if variables[name].type == type_name]
+            if columns:
+                output_groups.append((getter, [variables[self.output_feature_names[column - 1]].valueReference for column in columns],
+                                      columns))
+        if len(output_groups) == 1:
+            # Only one type - contiguous columns
+            output_groups[0] = output_groups[0][:2] + (slice(1, None),)
+        return output_groups
+
+    def get_final_state(self, state_variables=None, **kwargs):
+        """
+        Get final state of the last simulation
+        @param state_variables: names of recorded variables - ignored if the FMU state was kept
+        @return: serialized FMU state (bytes) if keep_fmu_state is enabled, else dict {name: value} of recorded outputs
+        """
+        if self.fmu_state_ is not None:
+            return self.fmu_state_
+        if self.simulation_results_ is None:
+            raise Exception("No simulation results - run a simulation first.")
+        if self.memmap_output:
+            final_row = dict(zip(self.output_feature_names, self.simulation_results_[-1, 1:]))
+        else:
+            final_row = {name: self.simulation_results_[name][-1] for name in self.simulation_results_.dtype.names}
+        names = state_variables if state_variables is not None else self.output_feature_names
+        return {name: float(final_row[name]) for name in names if name in final_row}
+
+    def set_initial_state(self, state, exp_name="", **kwargs):
+        """
+        Initialize the next simulation from a state
+        @param state: serialized FMU state (bytes) - restored instead of initializing the FMU,
+        or dict {name: value} - applied as start values (only settable variables, e.g. not calculated outputs)
+        @param exp_name: name of experiment
+        """
+        if isinstance(state, (bytes, bytearray)):
+            if self.fmu_ is None:
+                self._init_experiment(exp_name, **kwargs)
+            self.initial_fmu_state_ = bytes(state)
+        else:
+            settable_values = self._get_settable_values(state)
+            if not settable_values:
+                raise Exception("None of the handed over variables can be set as start value - "
+                                "enable keep_fmu_state to hand over the complete FMU state.")
+            skipped = [name for name in state if name not in settable_values]
+            if skipped:
+                print(f"Variables cannot be set as start values and are not handed over: {skipped}")
+            self._apply_warm_start(None, settable_values)
+
+    def _store_fmu_state(self):
+        """
+        Serialize the current FMU state - stored in fmu_state_
+        """
+        fmu_state = self.fmu_.getFMUState()
+        self.fmu_state_ = bytes(self.fmu_.serializeFMUState(fmu_state))
+        self.fmu_.freeFMUState(fmu_state)
+
+    def _restore_fmu_state(self, serialized_state):
+        fmu_state = self.fmu_.deserializeFMUState(serialized_state)
+        self.fmu_.setFMUState(fmu_state)
+        self.fmu_.freeFMUState(fmu_state)
+
+    def _count_step(self, step_time, recorder):
+        """
+        fmpy step callback - counts communication steps
+        """
+        self.fmu_statistics_.num_steps += 1
+        return True
+
+    def _get_warm_start_values(self, continuation_variables, **kwargs):
+        """
+        Get values of recorded continuation variables at start time from the last simulation
+        """
+        if self.simulation_results_ is None:
+            return None
+        if self.memmap_output:
+            first_row = dict(zip(self.output_feature_names, self.simulation_results_[0, 1:]))
+        else:
+            first_row = {name: self.simulation_results_[name][0] for name in self.simulation_results_.dtype.names}
+        return {name: float(first_row[name]) for name in continuation_variables if name in first_row}
+
+    def _apply_warm_start(self, neighbour_out_file_name, warm_start_values=None, **kwargs):
+        """
+        Seed the next simulation with the start values of a solved neighbour - only variables settable as start values.
+        FMUs cannot be initialized from a result file.
+        """
+        if not warm_start_values:
+            return
+        self.start_values_ = dict(self.start_values_) if self.start_values_ else {}
+        self.start_values_.update(self._get_settable_values(warm_start_values))
+
+    def _get_settable_values(self, values: dict):
+        """
+        Filter values of variables that can be set as start values
+        """
+        if self.model_description_ is None:
+            self.model_description_ = fmpy.read_model_description(self.fmu_filename)
+        variables = {variable.name: variable for variable in self.model_description_.modelVariables}
+        return {name: value for name, value in values.items() if name in variables and self._is_settable(variables[name])}
+
+    def _get_warm_start_backup(self):
+        return super()._get_warm_start_backup(), dict(self.start_values_) if self.start_values_ is not None else None
+
+    def _restore_warm_start_backup(self, backup):
+        super()._restore_warm_start_backup(backup[0])
+        self.start_values_ = backup[1]
+
+    @staticmethod
+    def _is_settable(variable):
+        """
+        Check if a variable can be set as start value
+        """
+        if variable.variability == "constant":
+            return False
+        return variable.causality in ("parameter", "input") or variable.initial in ("exact", "approx")
+
+    def _get_solver_statistics(self, wall_time=None, **kwargs):
+        """
+        Get statistics of the last simulation - co-simulation FMUs only report communication steps,
+        internal solver steps and rejected steps are not accessible through FMI.
+        """
+        statistics = SolverStatistics(**self.fmu_statistics_.to_dict()) if self.fmu_statistics_ is not None else SolverStatistics()
+        statistics.wall_time = wall_time
+        return statistics
+
+    def _get_memmap_results(self, trajectory_names):
+        """
+        Get results of memmap simulation - outputs only, no input data columns
+        @return: pd.DataFrame - a view on the result file if all outputs are requested
+        """
+        simulation_results = DataFrame(self.simulation_results_[:, 1:], index=self.simulation_results_[:, 0],
+                                       columns=self.output_feature_names, copy=False)
+        if list(trajectory_names) == list(self.output_feature_names):
+            return simulation_results
+        return simulation_results[trajectory_names]
+
+    def _get_result_file_path(self, out_file_name):
+        if self.memmap_output:
+            return os.path.join(self.get_data_dir(abspath=True), f"{out_file_name}.npy")
+        return None
 
 
 
@@ -0,0 +1,195 @@
+import ctypes
+import time
+
+import numpy as np
+import fmpy
+import fmpy.fmi2
+from fmpy.simulation import apply_start_values, settable_in_instantiated, settable_in_initialization_mode
+
+
+class FMUStepper:
+    """
+    Low-latency stepping interface for a single FMU (co-simulation), e.g. for model-predictive control loops.
+    The FMU is extracted and instantiated once and kept alive. Value references and ctypes buffers are precomputed,
+    so a step is one fmi2SetReal, one fmi2DoStep and one fmi2GetReal call - no dataframes on the hot path.
+    Parameters:
+        - fmu_filename: path to FMU
+        - input_names: names of real inputs - order of the input vectors
+        - output_names: names of real outputs - order of the output vectors
+        - step_size: communication step size in s
+        - start_time: start time in s
+        - start_values: dict of start values applied at (re-)initialization
+        - tolerance: relative tolerance of the FMU solver - None: FMU default
+        - fmu_instance_name: name of FMU instance
+    Additional Methods:
+    - step
+    - rollout
+    - reset
+    - save_state
+    - free_state
+    - benchmark
+    - terminate
+    """
+    fmu_instance_name = "Stepper"
+
+    def __init__(self, fmu_filename: str, input_names: list, output_names: list, step_size: float, start_time=0.0,
+                 start_values=None, tolerance=None, fmu_instance_name="Stepper"):
+        self.fmu_filename = fmu_filename
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+        self.step_size = float(step_size)
+        self.start_time = float(start_time)
+        self.start_values = dict(start_values) if start_values else {}
+        self.tolerance = tolerance
+        self.fmu_instance_name = fmu_instance_name
+        self.time_ = self.start_time
+        self.saved_states_ = []
+
+        self.model_description_ = fmpy.read_model_description(fmu_filename)
+        self.fmu_dir = fmpy.extract(fmu_filename)
+        self.fmu_ = fmpy.fmi2.FMU2Slave(guid=self.model_description_.guid,
+                                        unzipDirectory=self.fmu_dir,
+                                        modelIdentifier=self.model_description_.coSimulation.modelIdentifier,
+                                        instanceName=fmu_instance_name)
+        self.fmu_.instantiate()
+
+        variables = {variable.name: variable for variable in self.model_description_.modelVariables}
+        self.input_references_, self.input_values_ = self._create_buffers([variables[name].valueReference for name in self.input_names])
+        self.output_references_, self.output_values_ = self._create_buffers([variables[name].valueReference for name in self.output_names])
+        # Raw FMI functions and argument pointers - resolved once
+        self._component = self.fmu_.component
+        self._set_real = self.fmu_.fmi2SetReal
+        self._get_real = self.fmu_.fmi2GetReal
+        self._do_step = self.fmu_.fmi2DoStep
+        self._input_references = self.input_references_.ctypes.data_as(ctypes.POINTER(fmpy.fmi2.fmi2ValueReference))
+        self._input_values = self.input_values_.ctypes.data_as(ctypes.POINTER(fmpy.fmi2.fmi2Real))
+        self._output_references = self.output_references_.ctypes.data_as(ctypes.POINTER(fmpy.fmi2.fmi2ValueReference))
+        self._output_values = self.output_values_.ctypes.data_as(ctypes.POINTER(fmpy.fmi2.fmi2Real))
+        self._initialize()
+
+    @classmethod
+    def from_simulator(cls, simulator, step_size=None, **kwargs):
+        """
+        Create stepper with FMU, inputs, outputs, start values and simulation parameters of an FMPYSimulator
+        @param simulator: FMPYSimulator
+        @param step_size: communication step size - default: output interval of the simulator
+        @return: FMUStepper
+        """
+        return cls(simulator.fmu_filename, simulator.input_feature_names, simulator.output_feature_names,
+                   step_size if step_size else simulator.sim_params.output_interval, start_time=simulator.sim_params.start_time,
+                   start_values=simulator.start_values_, tolerance=simulator.sim_params.tolerance, **kwargs)
+
+    def step(self, inputs=None, out=None):
+        """
+        Set inputs, advance one communication step and read outputs
+        @param inputs: input values in order of input_names - None: keep previous inputs
+        @param out: optional array to write the outputs to
+        @return: outputs in order of output_names (copy or out)
+        """
+        if inputs is not None and len(self.input_names):
+            self.input_values_[:] = inputs
+            self._set_real(self._component, self._input_references, len(self.input_names), self._input_values)
+        self._do_step(self._component, self.time_, self.step_size, fmpy.fmi2.fmi2True)
+        self.time_ += self.step_size
+        self._get_real(self._component, self._output_references, len(self.output_names), self._output_values)
+        if out is None:
+            return self.output_values_.copy()
+        out[:] = self.output_values_
+        return out
+
+    def rollout(self, input_sequence, restore=True):
+        """
+        Simulate a horizon step by step
+        @param input_sequence: array of shape (horizon, inputs)
+        @param restore: restore the state before the rollout afterwards - e.g. for MPC predictions
+        @return: outputs - array of shape (horizon, outputs)
+        """
+        input_sequence = np.asarray(input_sequence, dtype=np.float64).reshape(-1, len(self.input_names))
+        outputs = np.empty((len(input_sequence), len(self.output_names)))
+        state = self.save_state() if restore else None
+        try:
+            for index in range(len(input_sequence)):
+                self.step(input_sequence[index], out=outputs[index])
+        finally:
+            if state is not None:
+                self.reset(state)
+                self.free_state(state)
+        return outputs
+
+    def save_state(self):
+        """
+        Save the current FMU state (kept in the FMU - no serialization)
+        @return: state handle - (FMU state, time)
+        """
+        state = (self.fmu_.getFMUState(), self.time_)
+        self.saved_states_.append(state)
+        return state
+
+    def free_state(self, state):
+        self.fmu_.freeFMUState(state[0])
+        self.saved_states_.remove(state)
+
+    def reset(self, state=None):
+        """
+        Reset to a saved state or re-initialize at the start time
+        @param state: state from save_state - None: re-initialize with start values
+        """
+        if state is not None:
+            self.fmu_.setFMUState(state[0])
+            self.time_ = state[1]
+        else:
+            self.fmu_.reset()
+            self._initialize()
+
+    def benchmark(self, num_steps=1000, inputs=None):
+        """
+        Microbenchmark of the per-step overhead. The state is restored afterwards.
+        @param num_steps: number of measured steps
+        @param inputs: input values - default: current inputs
+        @return: dict - mean time per step in s of step(), of the raw fmi2DoStep call and the overhead of step()
+        """
+        inputs = np.asarray(inputs, dtype=np.float64) if inputs is not None else self.input_values_.copy()
+        out = np.empty(len(self.output_names))
+        state = self.save_state()
+        try:
+            start = time.perf_counter()
+            for _ in range(num_steps):
+                self.step(inputs, out=out)
+            step_time = (time.perf_counter() - start) / num_steps
+            self.reset(state)
+            step_start_time = self.time_
+            start = time.perf_counter()
+            for index in range(num_steps):
+                self._do_step(self._component, step_start_time + index * self.step_size, self.step_size, fmpy.fmi2.fmi2True)
+            do_step_time = (time.perf_counter() - start) / num_steps
+        finally:
+            self.reset(state)
+            self.free_state(state)
+        return {"step_time": step_time, "do_step_time": do_step_time, "overhead": step_time - do_step_time}
+
+    def terminate(self):
+        """
+        Free saved states and the FMU instance
+        """
+        if self.fmu_ is None:
+            return
+        for state in list(self.saved_states_):
+            self.free_state(state)
+        self.fmu_.terminate()
+        self.fmu_.freeInstance()
+        self.fmu_ = None
+
+    ######################################## Private methods ###########################################################
+
+    @staticmethod
+    def _create_buffers(value_references):
+        return np.array(value_references, dtype=np.uint32), np.zeros(len(value_references))
+
+    def _initialize(self):
+        self.time_ = self.start_time
+        self.fmu_.setupExperiment(tolerance=self.tolerance, startTime=self.start_time)
+        start_values = apply_start_values(self.fmu_, self.model_description_, dict(self.start_values), settable=settable_in_instantiated)
+        self.fmu_.enterInitializationMode()
+        apply_start_values(self.fmu_, self.model_description_, start_values, settable=settable_in_initialization_mode)
+        self.fmu_.exitInitializationMode()
+        self._get_real(self._component, self._output_references, len(self.output_names), self._output_values)